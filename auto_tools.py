@@ -1,19 +1,40 @@
+from __future__ import annotations
+import json
+import os
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Optional, Tuple, Dict
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pyautogui
-import requests
-import numpy as np
-import cv2
-import ddddocr
-from selenium.webdriver.chrome.options import Options
+from urllib.parse import urlparse
+from instrumentation import execution_time_decorator, timed
+from lazy_import import lazy_import
+from template_match import get_matcher, ScreenWatcher
+from retry_policy import RetryPolicy, retry
+
+# 重依赖在第一次用到时才导入，只用到部分函数的脚本不用为OCR模型、OpenCV等付出启动时间
+webdriver = lazy_import("selenium.webdriver")
+selenium_exceptions = lazy_import("selenium.common.exceptions")
+selenium_ui = lazy_import("selenium.webdriver.support.ui")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+pyautogui = lazy_import("pyautogui", "需要图形界面，无头环境请不要使用图像点击功能")
+requests = lazy_import("requests")
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+ddddocr = lazy_import("ddddocr")
+Image = lazy_import("PIL.Image")
+
+# selenium.webdriver.common.by.By 的取值，写成常量避免为默认参数导入selenium
+CSS_SELECTOR = "css selector"
+XPATH = "xpath"
+WEBDRIVER_EXCEPTION = "selenium.common.exceptions.WebDriverException"
 
 # ========== 浏览器控制 ==========
+@timed()
 def start_browser(headless: bool = False, blocked_urls: Optional[list] = None, download_path: str = "downloads") -> webdriver.Chrome:
-    options = Options()
+    options = webdriver.ChromeOptions()
     if headless:
         options.add_argument("--headless")
     options.add_argument("--no-sandbox")
@@ -33,52 +54,316 @@ def quit_browser(driver: webdriver.Chrome):
     if driver:
         driver.quit()
 
+def is_driver_alive(driver: webdriver.Chrome) -> bool:
+    """浏览器是否还能正常响应"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+def reset_driver(driver: webdriver.Chrome, blocked_urls: Optional[list] = None, download_path: str = "downloads"):
+    """两次租用之间清理浏览器状态：关闭多余标签页、恢复拦截列表和下载目录，保留登录Cookies"""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get("about:blank")
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_urls or []})
+    driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": os.path.abspath(download_path)})
+
+class DriverPool:
+    """
+    保持若干个已启动（可选已登录）的浏览器，任务通过 lease() 借用，用完归还而不是关闭。
+
+    参数:
+    - size: 浏览器数量上限。
+    - factory: 创建浏览器的函数，默认无头的 start_browser。
+    - on_create: 新浏览器创建后调用一次，比如登录；返回False视为失败。
+    - max_uses: 每个浏览器借出多少次后回收重建，防止内存越用越多。
+    - blocked_urls / download_path: 每次归还时恢复成的默认拦截列表和下载目录。
+    - warm: 是否在创建池时就把浏览器全部启动好。
+    """
+    def __init__(self, size: int = 2, factory=None, on_create=None, max_uses: int = 50,
+                 blocked_urls: Optional[list] = None, download_path: str = "downloads", warm: bool = True):
+        self.size = size
+        self.factory = factory or (lambda: start_browser(headless=True, blocked_urls=blocked_urls, download_path=download_path))
+        self.on_create = on_create
+        self.max_uses = max_uses
+        self.blocked_urls = blocked_urls
+        self.download_path = download_path
+        self._idle = queue.Queue()
+        self._uses = {}  # driver -> 借出次数
+        self._starting = 0  # 正在启动中的浏览器数
+        self._lock = threading.Lock()
+        if warm:
+            for _ in range(size):
+                self._idle.put(self._create())
+
+    def _create(self) -> webdriver.Chrome:
+        with self._lock:
+            if len(self._uses) + self._starting >= self.size:
+                return None
+            self._starting += 1  # 先占位，避免并发时超出上限
+        try:
+            driver = self.factory()
+            if self.on_create and self.on_create(driver) is False:
+                driver.quit()
+                raise RuntimeError("DriverPool on_create failed")
+            with self._lock:
+                self._uses[driver] = 0
+            return driver
+        finally:
+            with self._lock:
+                self._starting -= 1
+
+    def _discard(self, driver: webdriver.Chrome):
+        with self._lock:
+            self._uses.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _acquire(self, timeout: Optional[float]) -> webdriver.Chrome:
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._create() or self._idle.get(timeout=timeout)
+            if is_driver_alive(driver):
+                return driver
+            print("Pooled browser is not responding, recreating it")
+            self._discard(driver)
+
+    def _release(self, driver: webdriver.Chrome, broken: bool):
+        with self._lock:
+            self._uses[driver] = uses = self._uses.get(driver, 0) + 1
+        if broken or uses >= self.max_uses or not is_driver_alive(driver):
+            self._discard(driver)
+            return
+        try:
+            reset_driver(driver, self.blocked_urls, self.download_path)
+        except Exception as e:
+            print(f"Failed to reset pooled browser: {e}")
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """借用一个浏览器：with pool.lease() as driver: ...；浏览器崩溃时会被回收重建"""
+        driver = self._acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except selenium_exceptions.WebDriverException:
+            broken = True
+            raise
+        finally:
+            self._release(driver, broken)
+
+    def close(self):
+        """关闭池中所有空闲浏览器"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 # ========== 装饰器 ==========
-def execution_time_decorator(func):
-    """用于装饰器，计算函数执行时间"""
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        print(f"Execution time: {time.time() - start_time:.2f}s")
-        return result
-    return wrapper
-
-def retry_on_exception(max_retries: int = 3):
-    """重试装饰器，处理常见的瞬时错误"""
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    print(f"Attempt {attempt + 1} failed: {e}")
-                    time.sleep(1)
-            raise RuntimeError("Max retries exceeded")
-        return wrapper
-    return decorator
+def retry_on_exception(max_retries: int = 3, retry_on: Tuple[type, ...] = (Exception,), base_delay: float = 0.005, deadline: Optional[float] = None):
+    """重试装饰器，处理常见的瞬时错误；指数退避加抖动，用尽后抛出带原始异常的 RetryError（RuntimeError 子类）"""
+    return retry(RetryPolicy(max_attempts=max_retries, retry_on=retry_on, base_delay=base_delay, deadline=deadline))
 
 # ========== 页面元素提取 ==========
-@retry_on_exception()
-def find_element_text(driver: webdriver.Chrome, selector: str, by: By = By.CSS_SELECTOR) -> str:
+@retry_on_exception(retry_on=(WEBDRIVER_EXCEPTION,))
+def find_element_text(driver: webdriver.Chrome, selector: str, by: str = CSS_SELECTOR) -> str:
     """根据选择器找到元素文本"""
     return driver.find_element(by, selector).text
 
-@retry_on_exception()
-def find_elements_attribute(driver: webdriver.Chrome, selector: str, attribute: str, by: By = By.CSS_SELECTOR) -> list:
-    """获取多个元素的属性值"""
+# 在浏览器里一次性读取所有元素的字段。arguments: 元素列表或选择器, 选择器类型, schema, 读取后打上的标记属性名（可选）
+EXTRACT_JS = """
+const [source, by, schema, mark] = arguments;
+let elements = source;
+if (by === 'css selector') {
+    elements = [...document.querySelectorAll(source)];
+} else if (by === 'xpath') {
+    const snapshot = document.evaluate(source, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    elements = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) elements.push(snapshot.snapshotItem(i));
+}
+const read = (el, spec) => {
+    const sep = spec.indexOf(' >> ');
+    if (sep >= 0) {
+        el = el.querySelector(spec.slice(0, sep));
+        spec = spec.slice(sep + 4);
+        if (!el) return null;
+    }
+    if (spec === 'text') return (el.innerText ?? el.textContent).trim();
+    if (spec === 'html') return el.innerHTML;
+    const [kind, name] = [spec.slice(0, spec.indexOf(':')), spec.slice(spec.indexOf(':') + 1)];
+    if (kind === 'attr') return el.getAttribute(name);
+    if (kind === 'prop') {
+        const value = el[name];
+        return value === undefined || typeof value === 'function' ? null : value;
+    }
+    if (kind === 'get') {  // 与 Selenium 的 get_attribute 一致：优先取属性值，布尔值转成 "true"/null
+        const value = el[name];
+        if (typeof value === 'boolean') return value ? 'true' : null;
+        if (value !== undefined && value !== null && typeof value !== 'object' && typeof value !== 'function') return String(value);
+        return el.getAttribute(name);
+    }
+    throw new Error('Unknown field spec: ' + spec);
+};
+return elements.map(el => {
+    if (mark) el.setAttribute(mark, '');
+    if (typeof schema === 'string') return read(el, schema);
+    const row = {};
+    for (const [field, spec] of Object.entries(schema)) row[field] = read(el, spec);
+    return row;
+});
+"""
+
+def extract_elements(driver: webdriver.Chrome, selector: str, schema="text", by: str = CSS_SELECTOR, mark: Optional[str] = None) -> list:
+    """
+    一次往返批量提取所有匹配元素的字段。
+
+    参数:
+    - schema: 单个字段说明（返回值列表），或 {字段名: 字段说明} 的字典（返回字典列表）。
+      字段说明: "text"、"html"、"attr:名字"（HTML属性）、"prop:名字"（DOM属性）、
+      "get:名字"（与 get_attribute 相同的规则），可以加 "子选择器 >> " 前缀，如 ".title >> text"。
+    - by: CSS 和 XPath 直接在浏览器里查找（一次往返），其它类型先 find_elements 再提取。
+    - mark: 给读取过的元素加上这个属性，配合 ":not([属性])" 只读新元素。
+    """
+    if by in (CSS_SELECTOR, XPATH):
+        return driver.execute_script(EXTRACT_JS, selector, by, schema, mark)
     elements = driver.find_elements(by, selector)
-    return [element.get_attribute(attribute) for element in elements]
+    return driver.execute_script(EXTRACT_JS, elements, None, schema, mark) if elements else []
+
+@retry_on_exception(retry_on=(WEBDRIVER_EXCEPTION,))
+def find_elements_attribute(driver: webdriver.Chrome, selector: str, attribute: str, by: str = CSS_SELECTOR) -> list:
+    """获取多个元素的属性值"""
+    return extract_elements(driver, selector, f"get:{attribute}", by)
 
 def get_video_durations(driver: webdriver.Chrome, selector: str = "video") -> list:
     """提取页面视频的持续时长"""
-    videos = driver.find_elements(By.CSS_SELECTOR, selector)
-    return [video.get_attribute("duration") for video in videos]
+    return extract_elements(driver, selector, "get:duration")
+
+# ========== 视频状态 ==========
+VIDEO_STATE_JS = """
+const num = x => Number.isFinite(x) ? x : null;
+return [...document.querySelectorAll(arguments[0])].map(v => {
+    const quality = v.getVideoPlaybackQuality ? v.getVideoPlaybackQuality() : null;
+    return {
+        currentTime: v.currentTime, duration: num(v.duration), paused: v.paused, ended: v.ended,
+        readyState: v.readyState, networkState: v.networkState, playbackRate: v.playbackRate, muted: v.muted,
+        buffered: Array.from({length: v.buffered.length}, (_, i) => [v.buffered.start(i), v.buffered.end(i)]),
+        frames: quality ? quality.totalVideoFrames : (v.webkitDecodedFrameCount ?? null),
+        droppedFrames: quality ? quality.droppedVideoFrames : (v.webkitDroppedFrameCount ?? null),
+        error: v.error ? v.error.message || String(v.error.code) : null,
+    };
+});
+"""
+
+# 等待视频事件。mode为'ended'时等播放结束，为'playing'时等开始播放；
+# 进度超过stallMs没动时返回stalled，本次等待超过chunkMs返回pending（由Python再次调用，避免WebDriver请求超时）
+VIDEO_WAIT_JS = """
+const [selector, index, mode, chunkMs, stallMs, reset] = arguments;
+const done = arguments[arguments.length - 1];
+const v = document.querySelectorAll(selector)[index];
+if (!v) return done({status: 'missing', reason: 'no video element'});
+if (reset || !v.__wait) v.__wait = {lastTime: v.currentTime, lastProgress: Date.now(), startTime: v.currentTime};
+const w = v.__wait;
+let finished = false;
+const finish = (status, reason) => {
+    if (finished) return;
+    finished = true;
+    clearInterval(watchdog);
+    clearTimeout(chunkTimer);
+    for (const [type, fn] of listeners) v.removeEventListener(type, fn);
+    done({status: status, reason: reason || null, currentTime: v.currentTime,
+          duration: Number.isFinite(v.duration) ? v.duration : null});
+};
+const isPlaying = () => !v.paused && v.readyState >= 3 && v.currentTime > w.startTime;
+const listeners = [
+    ['ended', () => finish('ended')],
+    ['error', () => finish('error', v.error ? v.error.message || String(v.error.code) : 'error')],
+    ['timeupdate', () => { if (mode === 'playing' && isPlaying()) finish('playing'); }],
+];
+for (const [type, fn] of listeners) v.addEventListener(type, fn);
+const watchdog = setInterval(() => {
+    if (v.currentTime !== w.lastTime) {
+        w.lastTime = v.currentTime;
+        w.lastProgress = Date.now();
+    } else if (Date.now() - w.lastProgress >= stallMs) {
+        finish('stalled', v.paused ? 'paused' : v.readyState < 3 ? 'buffering' : 'no progress');
+    }
+}, Math.min(1000, Math.max(50, stallMs / 4)));
+const chunkTimer = setTimeout(() => finish('pending'), chunkMs);
+if (v.ended) finish('ended');
+else if (v.error) finish('error', v.error.message || String(v.error.code));
+else if (mode === 'playing' && isPlaying()) finish('playing');
+"""
+
+def get_video_states(driver: webdriver.Chrome, selector: str = "video") -> list:
+    """一次调用返回页面上所有视频的完整状态：进度、时长、暂停/结束、readyState、缓冲区间、帧数等"""
+    return driver.execute_script(VIDEO_STATE_JS, selector)
+
+@contextmanager
+def _script_timeout(driver: webdriver.Chrome, seconds: float):
+    """临时修改异步脚本超时，结束后恢复原值；driver可能是共享的（比如从池里借出的），不能留下改过的设置"""
+    previous = driver.timeouts.script
+    driver.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        driver.set_script_timeout(previous)
+
+def _wait_video(driver: webdriver.Chrome, mode: str, selector: str, index: int, timeout: float, stall_timeout: float, chunk: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    reset = True
+    while True:
+        remaining = deadline - time.monotonic()
+        wait = max(0.0, min(chunk, remaining))
+        with _script_timeout(driver, wait + 10):
+            result = driver.execute_async_script(VIDEO_WAIT_JS, selector, index, mode, wait * 1000, stall_timeout * 1000, reset)
+        reset = False
+        if result['status'] != 'pending':
+            return result
+        if wait >= remaining:
+            result['status'] = 'timeout'
+            return result
+
+def wait_until_ended(driver: webdriver.Chrome, selector: str = "video", index: int = 0, timeout: float = 4 * 3600, stall_timeout: float = 60) -> dict:
+    """
+    等待视频播放结束，ended事件触发即返回。
+
+    返回 {'status', 'reason', 'currentTime', 'duration'}，status为 ended、stalled（进度超过stall_timeout秒没动，
+    reason说明是暂停、缓冲还是无进度）、error、missing 或 timeout。
+    """
+    return _wait_video(driver, "ended", selector, index, timeout, stall_timeout)
+
+def wait_until_playing(driver: webdriver.Chrome, selector: str = "video", index: int = 0, timeout: float = 15, stall_timeout: float = 10) -> dict:
+    """等待视频真正开始播放（进度在走），返回格式同 wait_until_ended，status为 playing 表示成功"""
+    return _wait_video(driver, "playing", selector, index, timeout, stall_timeout)
 
 # ========== 图片识别与点击 ==========
-def locate_image(image_path: str, confidence: float = 0.8) -> Optional[Tuple[int, int]]:
-    """在屏幕上定位图像位置"""
-    location = pyautogui.locateCenterOnScreen(image_path, confidence=confidence)
-    return location
+def locate_image(image_path: str, confidence: float = 0.8, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int]]:
+    """在屏幕（或region区域）上定位图像位置，模板只加载一次"""
+    found = get_matcher((image_path,), confidence=confidence).locate(region)
+    return found[1] if found else None
+
+def locate_any_image(image_paths: list, confidence: float = 0.8, region: Optional[Tuple[int, int, int, int]] = None, scales: Tuple[float, ...] = (1.0,)) -> Optional[Tuple[str, Tuple[int, int]]]:
+    """截一次屏匹配多张图像，返回第一个（按列表顺序）匹配上的 (图像路径, 中心坐标)"""
+    found = get_matcher(tuple(image_paths), tuple(scales), confidence).locate(region)
+    return found[:2] if found else None
 
 def click_image(image_path: str, confidence: float = 0.8, wait: float = 0.5) -> bool:
     """点击屏幕上的图像"""
@@ -89,25 +374,87 @@ def click_image(image_path: str, confidence: float = 0.8, wait: float = 0.5) ->
         return True
     return False
 
-def wait_and_click_image(image_path: str, timeout: int = 10, confidence: float = 0.8) -> bool:
-    """等待图像出现在屏幕上并点击"""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        if click_image(image_path, confidence):
-            return True
-        time.sleep(0.5)
+def wait_and_click_image(image_path: str, timeout: int = 10, confidence: float = 0.8, fps: float = 10, region: Optional[Tuple[int, int, int, int]] = None, stats: Optional[dict] = None) -> bool:
+    """等待图像出现在屏幕上并点击，只在画面变化时重新匹配；传入stats时会写入截屏/匹配/跳过的帧数"""
+    watcher = ScreenWatcher(get_matcher((image_path,), confidence=confidence), fps=fps, region=region)
+    found = watcher.wait(timeout)
+    if stats is not None:
+        stats.update(watcher.stats)
+    if found:
+        pyautogui.click(found[1])
+        return True
     return False
 
 # ========== 滚动与页面操作 ==========
+# 滚到底部，用MutationObserver等新内容加载：有DOM变化后安静quietMs就返回，一直没变化则timeoutMs后返回
+SCROLL_WAIT_JS = """
+const [timeoutMs, quietMs] = arguments;
+const done = arguments[arguments.length - 1];
+const startHeight = document.body.scrollHeight;
+let changed = false, finished = false, quietTimer = null;
+const finish = () => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(hardTimer);
+    done({changed: changed, grew: document.body.scrollHeight > startHeight});
+};
+const observer = new MutationObserver(() => {
+    changed = true;
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(finish, quietMs);
+});
+observer.observe(document.body, {childList: true, subtree: true});
+const hardTimer = setTimeout(finish, timeoutMs);
+window.scrollTo(0, document.body.scrollHeight);
+"""
+
+def _scroll_and_wait(driver: webdriver.Chrome, timeout: float, quiet: float) -> dict:
+    with _script_timeout(driver, timeout + 5):
+        return driver.execute_async_script(SCROLL_WAIT_JS, timeout * 1000, quiet * 1000)
+
 def scroll_to_bottom(driver: webdriver.Chrome, delay: int = 1, max_attempts: int = 5):
-    """滚动页面到底部"""
+    """滚动页面到底部，页面不再变高就提前停止；delay是每次滚动后等待新内容的最长时间"""
     for _ in range(max_attempts):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(delay)
-
-def click_element(driver: webdriver.Chrome, selector: str, by: By = By.CSS_SELECTOR):
+        if not _scroll_and_wait(driver, delay, min(0.3, delay))['grew']:
+            break
+
+def harvest_scroll(driver: webdriver.Chrome, item_selector: str, schema="text", key=None,
+                   wait_timeout: float = 3, quiet: float = 0.3, idle_rounds: int = 2, max_rounds: int = 500):
+    """
+    边滚动边收集无限滚动列表中的条目，每滚动一次 yield 一批新出现的条目（去重后）。
+
+    参数:
+    - item_selector: 条目的CSS选择器。
+    - schema: 每个条目提取哪些字段，同 extract_elements。
+    - key: 去重依据，字段名或函数；默认用整条记录。
+    - wait_timeout / quiet: 每次滚动后等待新内容的最长时间，以及DOM安静多久算加载完（秒）。
+    - idle_rounds: 连续多少次滚动后既没有新条目、页面也没变高就结束。
+      DOM变化只用来提前结束每次等待，不算进展，页面上有时钟、动画或轮播广告时也能正常停止。
+    """
+    mark = "data-harvested"
+    selector = f":is({item_selector}):not([{mark}])"
+    seen = set()
+    idle = 0
+    grew = True
+    for _ in range(max_rounds):
+        batch = []
+        for item in extract_elements(driver, selector, schema, mark=mark):
+            item_key = key(item) if callable(key) else item[key] if key else json.dumps(item, sort_keys=True, ensure_ascii=False)
+            if item_key not in seen:
+                seen.add(item_key)
+                batch.append(item)
+        if batch:
+            yield batch
+        idle = 0 if batch or grew else idle + 1
+        if idle >= idle_rounds:
+            break  # 最后几次滚动既没有新条目，页面也没变高，不会再有新内容
+        grew = _scroll_and_wait(driver, wait_timeout, quiet)['grew']
+
+def click_element(driver: webdriver.Chrome, selector: str, by: str = CSS_SELECTOR):
     """点击页面元素"""
-    element = WebDriverWait(driver, 10).until(
+    element = selenium_ui.WebDriverWait(driver, 10).until(
         EC.element_to_be_clickable((by, selector))
     )
     element.click()
@@ -122,21 +469,234 @@ def close_current_tab(driver: webdriver.Chrome):
     driver.switch_to.window(driver.window_handles[-1])
 
 # ========== 验证码处理 ==========
-def adjust_contrast(img: np.ndarray, contrast: float = 0.8, threshold: float = 0.5) -> np.ndarray:
-    """调整验证码图像的对比度"""
-    img = img.astype(float)
-    img_out = img + (img - threshold * 255.0) * ((1 / (1 - contrast)) - 1) if contrast >= 0 else img + (img - threshold * 255.0) * contrast
-    return np.clip(img_out, 0, 255).astype(np.uint8)
+@lru_cache(maxsize=64)
+def _contrast_lut(contrast: float, threshold: float) -> np.ndarray:
+    """对比度调整的256项查找表，和逐像素浮点计算的结果完全一致"""
+    x = np.arange(256, dtype=np.float64)
+    gain = (1 / (1 - contrast)) - 1 if contrast >= 0 else contrast
+    lut = np.clip(x + (x - threshold * 255.0) * gain, 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+def _is_color(img: np.ndarray) -> bool:
+    return img.ndim >= 3 and img.shape[-1] in (3, 4)
+
+def _as_uint8(img: np.ndarray, inplace: bool) -> Tuple[np.ndarray, bool]:
+    """非uint8的输入先截断成uint8（这一步已经复制，之后可以原地修改）"""
+    if img.dtype != np.uint8:
+        return np.clip(img, 0, 255).astype(np.uint8), True
+    return img, inplace
+
+def adjust_contrast(img: np.ndarray, contrast: float = 0.8, threshold: float = 0.5, inplace: bool = False) -> np.ndarray:
+    """
+    调整验证码图像的对比度，用256项查找表代替逐像素的浮点运算。
+    img 可以是单张图，也可以是 (N, H, W[, C]) 的一批图；inplace=True 时直接改写传入的uint8数组。
+    """
+    img, inplace = _as_uint8(img, inplace)
+    lut = _contrast_lut(float(contrast), float(threshold))
+    out = img if inplace else np.empty_like(img)
+    if img.flags.c_contiguous:
+        # 压平成二维后一次查表，单张图和一批图都只调用一次
+        cv2.LUT(img.reshape(img.shape[0], -1), lut, dst=out.reshape(out.shape[0], -1))
+    else:
+        np.take(lut, img, out=out)
+    return out
+
+def to_gray(img: np.ndarray, inplace: bool = False) -> np.ndarray:
+    """BGR图（或一批BGR图）转灰度，已经是灰度时原样返回"""
+    if not _is_color(img):
+        return img if inplace else img.copy()
+    img, _ = _as_uint8(img, inplace)
+    code = cv2.COLOR_BGRA2GRAY if img.shape[-1] == 4 else cv2.COLOR_BGR2GRAY
+    gray = cv2.cvtColor(np.ascontiguousarray(img).reshape(-1, img.shape[-2], img.shape[-1]), code)
+    return gray.reshape(img.shape[:-1])
+
+def binarize(img: np.ndarray, level: Optional[int] = None, inplace: bool = False) -> np.ndarray:
+    """二值化，level为None时每张图用Otsu自动选阈值；彩色图先转灰度"""
+    if _is_color(img):
+        img, inplace = to_gray(img), True
+    img, inplace = _as_uint8(img, inplace)
+    out = img if inplace else np.empty_like(img)
+    if level is not None and img.flags.c_contiguous:
+        cv2.threshold(img.reshape(img.shape[0], -1), level, 255, cv2.THRESH_BINARY, dst=out.reshape(out.shape[0], -1))
+    else:
+        for src, dst in zip(img.reshape(-1, *img.shape[-2:]), out.reshape(-1, *out.shape[-2:])):
+            cv2.threshold(src, level or 0, 255, cv2.THRESH_BINARY | (cv2.THRESH_OTSU if level is None else 0), dst=dst)
+    return out
+
+def denoise(img: np.ndarray, ksize: int = 3, inplace: bool = False) -> np.ndarray:
+    """中值滤波去掉验证码上的噪点和细干扰线"""
+    img, inplace = _as_uint8(img, inplace)
+    out = img if inplace else np.empty_like(img)
+    image_dims = 3 if _is_color(img) else 2
+    if img.ndim == image_dims:
+        cv2.medianBlur(img, ksize, dst=out)
+    else:
+        for src, dst in zip(img.reshape(-1, *img.shape[-image_dims:]), out.reshape(-1, *out.shape[-image_dims:])):
+            cv2.medianBlur(src, ksize, dst=dst)
+    return out
+
+CAPTCHA_STAGES = {'contrast': adjust_contrast, 'gray': to_gray, 'binarize': binarize, 'denoise': denoise}
+
+# 和原来一样只调整对比度；可以组合成比如 [("gray", {}), ("contrast", {...}), ("denoise", {"ksize": 3}), ("binarize", {})]
+DEFAULT_CAPTCHA_PIPELINE = (("contrast", {"contrast": 0.8, "threshold": 0.5}),)
+
+def preprocess_captcha(img: np.ndarray, pipeline=DEFAULT_CAPTCHA_PIPELINE, inplace: bool = False) -> np.ndarray:
+    """
+    按 pipeline（[(阶段名, 参数字典), ...]）依次处理验证码图像或一批图像。
+    只有第一个阶段按 inplace 决定是否复制输入，之后都在中间结果上原地修改。
+    """
+    for i, (name, params) in enumerate(pipeline):
+        img = CAPTCHA_STAGES[name](img, inplace=inplace or i > 0, **params)
+    return img
+
+def decode_captcha(image: bytes) -> np.ndarray:
+    img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("无法解码验证码图片")
+    return img
+
+def to_ocr_input(img: np.ndarray) -> "Image.Image":
+    """把处理后的数组包成PIL图像直接交给OCR，省掉编码成PNG再让OCR解码的一轮"""
+    return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if _is_color(img) else img)
+
+def preprocess_captchas(images: list, pipeline=DEFAULT_CAPTCHA_PIPELINE) -> list:
+    """批量预处理验证码bytes：尺寸相同时叠成一个数组一次处理完，返回可以直接交给OCR的图像列表"""
+    decoded = [decode_captcha(image) for image in images]
+    if decoded and len({img.shape for img in decoded}) == 1:
+        decoded = list(preprocess_captcha(np.stack(decoded), pipeline, inplace=True))
+    else:
+        decoded = [preprocess_captcha(img, pipeline, inplace=True) for img in decoded]
+    return [to_ocr_input(img) for img in decoded]
+
+_shared_lock = threading.Lock()
+_ocr_instance = None
+_ocr_pools = {}
+_http_session = None
+
+def get_ocr() -> "ddddocr.DdddOcr":
+    """进程内共享的OCR实例，第一次调用时才加载模型"""
+    global _ocr_instance
+    if _ocr_instance is None:
+        with _shared_lock:
+            if _ocr_instance is None:
+                _ocr_instance = ddddocr.DdddOcr(show_ad=False)
+    return _ocr_instance
+
+class OcrPool:
+    """固定数量的OCR实例，供多线程并行识别；onnxruntime推理时会释放GIL"""
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(ddddocr.DdddOcr(show_ad=False))
+
+    def classify(self, img) -> str:
+        ocr = self._idle.get()
+        try:
+            return ocr.classification(img)
+        finally:
+            self._idle.put(ocr)
+
+    def classify_batch(self, images: list) -> list:
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(self.classify, images))
+
+def get_ocr_pool(size: int = 2) -> OcrPool:
+    """按大小缓存的OCR池，模型只加载一次"""
+    with _shared_lock:
+        if size not in _ocr_pools:
+            _ocr_pools[size] = OcrPool(size)
+        return _ocr_pools[size]
+
+def get_http_session(pool_size: int = 10) -> requests.Session:
+    """进程内共享的requests Session，复用keep-alive连接"""
+    global _http_session
+    if _http_session is None:
+        with _shared_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session = session
+    return _http_session
+
+def classify_captchas(images: list, workers: int = 1) -> list:
+    """批量识别验证码图片（bytes或PIL图像），workers大于1时用OCR池并行识别"""
+    if workers <= 1:
+        ocr = get_ocr()
+        return [ocr.classification(img) for img in images]
+    return get_ocr_pool(workers).classify_batch(images)
+
+def _fetch_captcha(url: str) -> bytes:
+    return get_http_session().get(url, timeout=10).content
+
+def _parse_ocr_result(result: dict) -> Tuple[str, float]:
+    if 'text' in result:
+        return result['text'], float(result['confidence'])
+    # 老版本ddddocr只返回每个位置的字符概率，按CTC解码：先合并连续重复的字符，再去掉空白（下标0）
+    probs = np.asarray(result['probability'])
+    best = probs.argmax(axis=1)
+    keep = (best != 0) & np.append(True, best[1:] != best[:-1])
+    text = "".join(result['charsets'][i] for i in best[keep])
+    kept = probs.max(axis=1)[keep]
+    return text, float(kept.mean()) if len(kept) else 0.0
+
+def _classify_with_confidence(img) -> Tuple[str, float]:
+    return _parse_ocr_result(get_ocr().classification(img, probability=True))
+
+@timed()
+def solve_captcha(image: bytes, contrast: float = 0.8, threshold: float = 0.5, pipeline=None) -> Tuple[str, float]:
+    """
+    在内存中预处理并识别验证码，返回 (识别结果, 置信度)。
+    pipeline 默认只按 contrast/threshold 调整对比度；传入空列表时原始bytes直接交给OCR，不做任何解码。
+    """
+    if pipeline is None:
+        pipeline = (("contrast", {"contrast": contrast, "threshold": threshold}),)
+    if not pipeline:
+        return _classify_with_confidence(image)
+    return _classify_with_confidence(to_ocr_input(preprocess_captcha(decode_captcha(image), pipeline, inplace=True)))
+
+# 自动选择参数时尝试的对比度/阈值组合
+CAPTCHA_GRID = {'contrast': (0.5, 0.7, 0.8, 0.9), 'threshold': (0.4, 0.5, 0.6)}
+_captcha_styles = {}  # 验证码样式 -> 之前选出的 (contrast, threshold)
+
+def auto_solve_captcha(image: bytes, style: str = "default", min_confidence: float = 0.9, grid: Optional[dict] = None) -> Tuple[str, float, Tuple[float, float]]:
+    """
+    自动选择对比度参数识别验证码，返回 (识别结果, 置信度, (contrast, threshold))。
+
+    先用这个样式（比如站点名）上次选出的参数识别，置信度达到 min_confidence 就直接返回；
+    否则把 grid 里的参数组合都试一遍（一次复制出整批图像，逐张查表调整），取置信度最高的结果并记住它的参数。
+    """
+    img = decode_captcha(image)
+    cached = _captcha_styles.get(style)
+    if cached:
+        text, confidence = _classify_with_confidence(to_ocr_input(adjust_contrast(img, *cached)))
+        if confidence >= min_confidence:
+            return text, confidence, cached
+
+    grid = grid or CAPTCHA_GRID
+    params = [(c, t) for c in grid['contrast'] for t in grid['threshold']]
+    batch = np.repeat(img[None], len(params), axis=0)
+    results = []
+    for frame, (c, t) in zip(batch, params):
+        results.append(_classify_with_confidence(to_ocr_input(adjust_contrast(frame, c, t, inplace=True))))
+    best = max(range(len(params)), key=lambda i: results[i][1])
+    with _shared_lock:
+        _captcha_styles[style] = params[best]
+    return (*results[best], params[best])
 
 def process_captcha_from_url(url: str, contrast: float = 0.8, threshold: float = 0.5) -> str:
     """从URL下载并处理验证码"""
-    response = requests.get(url)
-    img = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
-    img = adjust_contrast(img, contrast, threshold)
-    
-    ocr = ddddocr.DdddOcr(show_ad=False)
-    result = ocr.classification(cv2.imencode(".png", img)[1].tobytes())
-    return result
+    return solve_captcha(_fetch_captcha(url), contrast, threshold)[0]
+
+def process_captchas_from_urls(urls: list, contrast: float = 0.8, threshold: float = 0.5, workers: int = 4) -> list:
+    """批量下载并识别验证码：并行下载，整批一起预处理，再并行识别，结果与urls顺序一致"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        images = list(executor.map(_fetch_captcha, urls))
+    pipeline = (("contrast", {"contrast": contrast, "threshold": threshold}),)
+    return classify_captchas(preprocess_captchas(images, pipeline), workers)
 
 # ========== Session管理 ==========
 def login_with_session(login_url: str, username: str, password: str, headers: Optional[Dict[str, str]] = None, csrf_selector: Optional[str] = None, csrf_token: Optional[str] = None) -> Optional[requests.Session]:
@@ -174,18 +734,115 @@ def extract_csrf_token(page_content: str, selector: str) -> str:
     # 根据实际页面结构提取csrf_token
     return "123456"  # 示例返回
 
+def session_from_driver(driver: webdriver.Chrome, pool_size: int = 10, headers: Optional[Dict[str, str]] = None, session: Optional[requests.Session] = None) -> requests.Session:
+    """把浏览器登录后的Cookies和User-Agent转移到带连接池（keep-alive）的requests Session"""
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": driver.execute_script("return navigator.userAgent"),
+        "Referer": driver.current_url,
+    })
+    session.headers.update(headers or {})
+    session.cookies.clear()
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    return session
+
+class HybridSession:
+    """
+    浏览器登录一次（验证码、JS都交给浏览器），之后的批量只读请求走带连接池的HTTP会话；
+    检测到会话过期时自动用浏览器重新登录并同步Cookies，然后重试一次。
+
+    参数:
+    - driver: 已打开的浏览器。
+    - login: 用浏览器登录的函数，参数是driver，成功返回True，比如 lambda d: login_with_captcha(d, url, user, pwd, config)。
+    - pool_size: 连接池大小，并发请求数不要超过它。
+    - is_expired: 判断响应是否表示会话过期的函数，默认按401/403或被重定向到 login_url 判断。
+    - login_url: 登录页地址，响应的最终地址（同一主机、同一路径，忽略查询参数）是它时视为过期；
+      不给时只按状态码判断。
+    """
+    def __init__(self, driver: webdriver.Chrome, login, pool_size: int = 10, headers: Optional[Dict[str, str]] = None, is_expired=None, timeout: float = 15, login_url: Optional[str] = None):
+        self.driver = driver
+        self.login = login
+        self.pool_size = pool_size
+        self.headers = headers
+        self.timeout = timeout
+        self.login_url = urlparse(login_url) if login_url else None
+        self.is_expired = is_expired or self._default_is_expired
+        self._lock = threading.Lock()
+        self._generation = 0  # 每重新登录一次加1，避免多个线程同时发现过期时重复登录
+        if not login(driver):
+            raise RuntimeError("Browser login failed")
+        self.session = session_from_driver(driver, pool_size, headers)
+
+    def _default_is_expired(self, response) -> bool:
+        if response.status_code in (401, 403):
+            return True
+        if self.login_url is None:
+            return False
+        url = urlparse(response.url)
+        return (url.netloc, url.path.rstrip("/")) == (self.login_url.netloc, self.login_url.path.rstrip("/"))
+
+    def relogin(self, seen_generation: int):
+        with self._lock:
+            if self._generation != seen_generation:
+                return  # 其他线程已经重新登录过了
+            print("Session expired, logging in again with the browser")
+            if not self.login(self.driver):
+                raise RuntimeError("Browser re-login failed")
+            session_from_driver(self.driver, headers=self.headers, session=self.session)
+            self._generation += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        generation = self._generation
+        response = self.session.request(method, url, **kwargs)
+        if self.is_expired(response):
+            self.relogin(generation)
+            response = self.session.request(method, url, **kwargs)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_json(self, url: str, **kwargs):
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def download(self, url: str, path: str, chunk_size: int = 1 << 16) -> str:
+        """流式下载文件到path"""
+        with self.get(url, stream=True) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+        return path
+
+    def fetch_all(self, urls: list, workers: Optional[int] = None) -> list:
+        """并发GET一批URL（共享连接池），返回与urls顺序一致的响应列表"""
+        with ThreadPoolExecutor(max_workers=min(workers or self.pool_size, self.pool_size)) as executor:
+            return list(executor.map(self.get, urls))
+
 # ========== Selenium自动化登录 ==========
+@timed()
 def login_with_selenium(driver: webdriver.Chrome, login_url: str, username: str, password: str, config: Dict[str, str]) -> bool:
     """使用Selenium自动化登录并返回True或False"""
     driver.get(login_url)
 
-    driver.find_element(By.CSS_SELECTOR, config['username_selector']).send_keys(username)
-    driver.find_element(By.CSS_SELECTOR, config['password_selector']).send_keys(password)
-    driver.find_element(By.CSS_SELECTOR, config['login_button_selector']).click()
+    driver.find_element(CSS_SELECTOR, config['username_selector']).send_keys(username)
+    driver.find_element(CSS_SELECTOR, config['password_selector']).send_keys(password)
+    driver.find_element(CSS_SELECTOR, config['login_button_selector']).click()
 
     try:
-        WebDriverWait(driver, config.get('wait_timeout', 10)).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, config['login_success_selector']))
+        selenium_ui.WebDriverWait(driver, config.get('wait_timeout', 10)).until(
+            EC.presence_of_element_located((CSS_SELECTOR, config['login_success_selector']))
         )
         print("Login successful")
         return True
@@ -197,34 +854,95 @@ def get_cookies(driver: webdriver.Chrome) -> dict:
     """获取登录后的Cookies"""
     return {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
 
-def login_with_captcha(driver: webdriver.Chrome, login_url: str, username: str, password: str, config: Dict[str, str]) -> bool:
-    """处理带验证码的登录"""
-    driver.get(login_url)
-
-    driver.find_element(By.CSS_SELECTOR, config['username_selector']).send_keys(username)
-    driver.find_element(By.CSS_SELECTOR, config['password_selector']).send_keys(password)
+def refresh_captcha(driver: webdriver.Chrome, config: Dict[str, str]):
+    """只刷新验证码图片（不重新加载登录页），等到图片src变化"""
+    captcha_image = driver.find_element(CSS_SELECTOR, config['captcha_image_selector'])
+    old_src = captcha_image.get_attribute("src")
+    driver.find_element(CSS_SELECTOR, config.get('captcha_refresh_selector') or config['captcha_image_selector']).click()
+    try:
+        selenium_ui.WebDriverWait(driver, 2).until(
+            lambda d: d.find_element(CSS_SELECTOR, config['captcha_image_selector']).get_attribute("src") != old_src
+        )
+    except Exception:
+        pass  # 有的站点src不变，只是换了图片内容
 
-    captcha_image = driver.find_element(By.CSS_SELECTOR, config['captcha_image_selector'])
-    captcha_image.screenshot("captcha.png")
-    captcha_text = ""  # 使用OCR识别验证码
+def _login_result(driver: webdriver.Chrome, config: Dict[str, str]) -> bool:
+    """等待登录结果：出现成功元素返回True；出现错误提示或超时返回False"""
+    error_selector = config.get('captcha_error_selector')
 
-    driver.find_element(By.CSS_SELECTOR, config['captcha_input_selector']).send_keys(captcha_text)
-    driver.find_element(By.CSS_SELECTOR, config['login_button_selector']).click()
+    def settled(d):
+        if d.find_elements(CSS_SELECTOR, config['login_success_selector']):
+            return "ok"
+        if error_selector and any(e.is_displayed() for e in d.find_elements(CSS_SELECTOR, error_selector)):
+            return "error"
+        return False
 
     try:
-        WebDriverWait(driver, config.get('wait_timeout', 10)).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, config['login_success_selector']))
-        )
-        print("Login successful")
-        return True
+        return selenium_ui.WebDriverWait(driver, config.get('wait_timeout', 10)).until(settled) == "ok"
     except Exception:
-        print("Login failed")
         return False
 
+@timed()
+def login_with_captcha(driver: webdriver.Chrome, login_url: str, username: str, password: str, config: Dict[str, str], attempts: Optional[list] = None) -> bool:
+    """
+    处理带验证码的登录：验证码截图在内存中识别，识别把握不大或登录失败时只刷新验证码重试。
+
+    config 中可选的键: captcha_max_attempts, captcha_min_confidence, captcha_length,
+    captcha_refresh_selector, captcha_error_selector, captcha_contrast, captcha_threshold，
+    captcha_auto（为True时自动选择对比度参数，按 captcha_style 缓存，默认按登录地址区分）。
+    传入 attempts 列表时，每次尝试的耗时和结果会追加进去。
+    """
+    driver.get(login_url)
+
+    driver.find_element(CSS_SELECTOR, config['username_selector']).send_keys(username)
+    driver.find_element(CSS_SELECTOR, config['password_selector']).send_keys(password)
+
+    attempts = attempts if attempts is not None else []
+    for attempt in range(1, config.get('captcha_max_attempts', 5) + 1):
+        start = time.perf_counter()
+        png = driver.find_element(CSS_SELECTOR, config['captcha_image_selector']).screenshot_as_png
+        shot_done = time.perf_counter()
+        if config.get('captcha_auto'):
+            captcha_text, confidence, _ = auto_solve_captcha(png, config.get('captcha_style', login_url), config.get('captcha_min_confidence', 0.9))
+        else:
+            captcha_text, confidence = solve_captcha(png, config.get('captcha_contrast', 0.8), config.get('captcha_threshold', 0.5))
+        ocr_done = time.perf_counter()
+        record = {'attempt': attempt, 'text': captcha_text, 'confidence': confidence,
+                  'screenshot': shot_done - start, 'ocr': ocr_done - shot_done}
+        attempts.append(record)
+
+        # 把握不大或长度不对的结果不提交，直接换一张
+        expected_length = config.get('captcha_length')
+        if confidence < config.get('captcha_min_confidence', 0.0) or not captcha_text or (expected_length and len(captcha_text) != expected_length):
+            record.update(result="skipped", total=time.perf_counter() - start)
+            refresh_captcha(driver, config)
+            continue
+
+        captcha_input = driver.find_element(CSS_SELECTOR, config['captcha_input_selector'])
+        captcha_input.clear()
+        captcha_input.send_keys(captcha_text)
+        driver.find_element(CSS_SELECTOR, config['login_button_selector']).click()
+
+        success = _login_result(driver, config)
+        record.update(result="ok" if success else "failed", submit=time.perf_counter() - ocr_done, total=time.perf_counter() - start)
+        print(f"Captcha attempt {attempt}: '{captcha_text}' ({confidence:.2f}) {record['result']}, {record['total']:.2f}s")
+        if success:
+            print("Login successful")
+            return True
+
+        # 有的站点登录失败会清空密码
+        password_input = driver.find_element(CSS_SELECTOR, config['password_selector'])
+        if not password_input.get_attribute("value"):
+            password_input.send_keys(password)
+        refresh_captcha(driver, config)
+
+    print("Login failed")
+    return False
+
 # ========== 浏览器初始化 ==========
 def initialize_driver(driver_path: str, headless: bool = True) -> webdriver.Chrome:
     """初始化浏览器驱动，支持无头模式"""
-    options = Options()
+    options = webdriver.ChromeOptions()
     if headless:
         options.add_argument("--headless")
         options.add_argument("--disable-gpu")
@@ -0,0 +1,380 @@
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import string
+import struct
+import threading
+import time
+import uuid
+from functools import lru_cache
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAY_BUTTON_IMAGE = os.path.join(ROOT, "play.png")  # main-sens.py 图像定位用的第一张模板
+
+# ========== 本地培训站点 ==========
+# 模仿线上培训平台的页面结构（选择器和 main-sens.py 的 CONFIG 一致），用来在本机压测各个环节：
+#   /login            登录页（带图片验证码，require_captcha=True 时才校验）
+#   /home             登录后的首页，有“课程”入口
+#   /courses?page=N   课程列表，卡片由 /course/list 接口渲染，学习状态由 /course/status 异步填充
+#   /video?id=X       视频页，里面是 /player?id=X 的 iframe 播放器（video.js 风格的DOM），
+#                     播放按钮用 canvas 画出 play.png 的像素，图像定位和元素定位都能点中
+#   /media/X.wav      合成的静音音频，<video> 可以直接播放，时长就是视频时长
+#   /study/progress   播放结束时上报进度，之后列表里这门课显示已完成
+# 学习记录按用户名分开保存，多个账号并行压测互不影响。
+
+DEFAULTS = {
+    'pages': 3,  # 列表页数
+    'cards_per_page': 6,  # 每页课程数
+    'completed_ratio': 0.3,  # 一开始就已完成的课程比例
+    'video_seconds': 3,  # 每个视频的时长
+    'status_delay_ms': 300,  # 学习状态比卡片晚多久加载出来
+    'api_delay_ms': 50,  # 接口的模拟延迟
+    'require_captcha': False,  # 登录时是否校验验证码
+    'seed': 0,
+}
+
+LOGIN_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>登录</title></head><body>
+<form id="login-form" onsubmit="return false">
+  <input id="D65username" name="username" placeholder="用户名">
+  <input id="D65pword" name="password" type="password" placeholder="密码">
+  <img id="captcha-image" src="/captcha.png?t=0" width="120" height="40">
+  <a id="captcha-refresh" href="javascript:void 0">换一张</a>
+  <input id="captcha-input" name="captcha" placeholder="验证码">
+  <button id="D65login" type="submit">登录</button>
+  <div class="login-error" style="display:none">用户名、密码或验证码错误</div>
+</form>
+<script>
+const img = document.getElementById('captcha-image');
+const refresh = () => { img.src = '/captcha.png?t=' + Date.now(); };
+document.getElementById('captcha-refresh').onclick = refresh;
+img.onclick = refresh;
+document.getElementById('D65login').onclick = async () => {
+  const body = new URLSearchParams(new FormData(document.getElementById('login-form')));
+  const res = await fetch('/api/login', {method: 'POST', body});
+  if (res.ok) { location.href = '/home'; return; }
+  document.querySelector('.login-error').style.display = 'block';
+  document.getElementById('D65pword').value = '';
+  refresh();
+};
+</script></body></html>"""
+
+HOME_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>首页</title></head><body>
+<header><span class="app-header-logo">培训平台</span></header>
+<nav><a href="/courses?page=1">课程</a></nav>
+</body></html>"""
+
+COURSES_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>课程</title></head><body>
+<header><span class="app-header-logo">培训平台</span></header>
+<div id="list"></div>
+<ul class="pagination"></ul>
+<div id="pager"></div>
+<script>
+const PAGES = __PAGES__;
+let current = __PAGE__;
+const list = document.getElementById('list');
+
+async function load(page) {
+  const data = await (await fetch('/course/list?page=' + page)).json();
+  list.innerHTML = '';
+  for (const item of data.data.list) {
+    const card = document.createElement('div');
+    card.className = 'card-item';
+    card.dataset.id = item.id;
+    card.innerHTML = `<a class="content-area" href="/video?id=${item.id}" target="_blank">${item.name}<br>学分: 1 学时: 1 共1节</a>` +
+                     `<span class="status"></span>`;
+    list.appendChild(card);
+  }
+  current = page;
+  history.replaceState(null, '', '/courses?page=' + page);
+  renderPager();
+  // 学习状态单独加载，比卡片晚出现
+  const statuses = await (await fetch('/course/status?page=' + page)).json();
+  if (page !== current) return;
+  for (const card of list.querySelectorAll('.card-item')) {
+    card.querySelector('.status').textContent = statuses[card.dataset.id] ? '已完成' : '未完成';
+  }
+}
+
+function renderPager() {
+  const pager = document.getElementById('pager');
+  pager.innerHTML = '';
+  const button = (text, page) => {
+    const b = document.createElement('button');
+    b.textContent = text;
+    b.onclick = () => load(page);
+    pager.appendChild(b);
+  };
+  if (current > 1) button('上一页', current - 1);
+  if (current < PAGES) button('下一页', current + 1);
+  const numbers = document.querySelector('.pagination');
+  numbers.innerHTML = '';
+  for (let i = 1; i <= PAGES; i++) {
+    const li = document.createElement('li');
+    li.textContent = i;
+    li.onclick = () => load(i);
+    numbers.appendChild(li);
+  }
+}
+
+load(current);
+</script></body></html>"""
+
+VIDEO_HTML = """<!doctype html><html><head><meta charset="utf-8"><title>__TITLE__</title></head><body>
+<h1>__TITLE__</h1>
+<iframe src="/player?id=__ID__" width="640" height="400"></iframe>
+</body></html>"""
+
+PLAYER_HTML = """<!doctype html><html><head><meta charset="utf-8">
+<style>
+  .video-js { position: relative; width: 600px; height: 340px; background: #000; }
+  .vjs-big-play-button { position: absolute; left: 260px; top: 140px; width: 80px; height: 60px; background: #2b333f;
+                         display: flex; align-items: center; justify-content: center; cursor: pointer; }
+  .vjs-control-bar { color: #fff; position: absolute; bottom: 0; }
+</style></head><body>
+<div class="progress-view-status">__STATUS__</div>
+<div class="video-js">
+  <video preload="auto" src="/media/__ID__.wav" width="600" height="300"></video>
+  <div class="vjs-big-play-button"><canvas width="__PLAY_WIDTH__" height="__PLAY_HEIGHT__"></canvas></div>
+  <div class="vjs-control-bar">
+    <span class="vjs-current-time-display">Current Time 0:00</span> /
+    <span class="vjs-duration-display">Duration __DURATION__</span>
+  </div>
+</div>
+<script>
+const video = document.querySelector('video');
+// 按钮图案直接写像素，不走图片请求，精简模式（不加载图片）下也和模板一致
+const canvas = document.querySelector('.vjs-big-play-button canvas');
+const pixels = atob('__PLAY_PIXELS__');
+const image = canvas.getContext('2d').createImageData(canvas.width, canvas.height);
+for (let i = 0; i < pixels.length; i++) image.data[i] = pixels.charCodeAt(i);
+canvas.getContext('2d').putImageData(image, 0, 0);
+const fmt = s => Math.floor(s / 60) + ':' + String(Math.floor(s % 60)).padStart(2, '0');
+document.querySelector('.vjs-big-play-button').onclick = e => {
+  e.currentTarget.style.display = 'none';
+  video.play();
+};
+video.addEventListener('timeupdate', () => {
+  document.querySelector('.vjs-current-time-display').textContent = 'Current Time ' + fmt(video.currentTime);
+});
+video.addEventListener('ended', async () => {
+  const res = await fetch('/study/progress', {method: 'POST', body: JSON.stringify({courseId: '__ID__'})});
+  if (res.ok) document.querySelector('.progress-view-status').textContent = '已完成';
+});
+</script></body></html>"""
+
+def make_wav(seconds: float, rate: int = 8000) -> bytes:
+    """生成指定时长的静音WAV（8kHz 16bit 单声道），浏览器的<video>可以直接播放"""
+    size = int(seconds * rate) * 2
+    header = b"RIFF" + struct.pack("<I", 36 + size) + b"WAVE"
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+    return header + fmt + b"data" + struct.pack("<I", size) + bytes(size)
+
+@lru_cache(maxsize=None)
+def play_button_pixels() -> tuple:
+    """播放按钮模板去掉透明通道后的 (宽, 高, base64的RGBA像素)，和 TemplateMatcher 读到的灰度图一致"""
+    from PIL import Image
+    img = Image.open(PLAY_BUTTON_IMAGE).convert("RGB").convert("RGBA")
+    return img.width, img.height, base64.b64encode(img.tobytes()).decode("ascii")
+
+def make_captcha(text: str) -> bytes:
+    """画一张带干扰线的验证码PNG"""
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.new("RGB", (120, 40), (235, 235, 235))
+    draw = ImageDraw.Draw(img)
+    rng = random.Random(text)
+    for _ in range(4):
+        draw.line([(rng.randint(0, 120), rng.randint(0, 40)), (rng.randint(0, 120), rng.randint(0, 40))], fill=(150, 150, 150))
+    draw.text((12, 4), text, fill=(40, 40, 40), font=ImageFont.load_default(size=28))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+class FixtureSite:
+    """站点数据和每个用户的学习记录，线程安全"""
+    def __init__(self, **options):
+        self.options = {**DEFAULTS, **options}
+        rng = random.Random(self.options['seed'])
+        self.courses = {}  # id -> {'id', 'name', 'page', 'completed'}
+        for page in range(1, self.options['pages'] + 1):
+            for i in range(1, self.options['cards_per_page'] + 1):
+                course_id = f"c{page:02d}{i:02d}"
+                self.courses[course_id] = {'id': course_id, 'name': f"课程{page}-{i}", 'page': page,
+                                           'completed': rng.random() < self.options['completed_ratio']}
+        self.sessions = {}  # 会话cookie -> {'user', 'captcha'}
+        self.progress = {}  # 用户名 -> 已完成的课程id集合
+        self.stats = {'requests': 0, 'logins': 0, 'completions': 0}
+        self._lock = threading.Lock()
+
+    def completed(self, user: str, course_id: str) -> bool:
+        return self.courses[course_id]['completed'] or course_id in self.progress.get(user, ())
+
+    def complete(self, user: str, course_id: str):
+        with self._lock:
+            self.progress.setdefault(user, set()).add(course_id)
+            self.stats['completions'] += 1
+
+    def page_courses(self, page: int) -> list:
+        return [c for c in self.courses.values() if c['page'] == page]
+
+class Handler(BaseHTTPRequestHandler):
+    site: FixtureSite = None  # 由 start_server 绑定
+
+    def log_message(self, format, *args):
+        pass  # 压测时不打印访问日志
+
+    # ---------- 工具 ----------
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        sid = cookie["sid"].value if "sid" in cookie else None
+        if sid not in self.site.sessions:
+            sid = uuid.uuid4().hex
+            self.site.sessions[sid] = {'user': None, 'captcha': None}
+        return sid, self.site.sessions[sid]
+
+    def _send(self, body, content_type="text/html; charset=utf-8", status=200, sid=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        if sid:
+            self.send_header("Set-Cookie", f"sid={sid}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data, status=200, sid=None):
+        time.sleep(self.site.options['api_delay_ms'] / 1000)
+        self._send(json.dumps(data, ensure_ascii=False), "application/json; charset=utf-8", status, sid)
+
+    def _redirect(self, location, sid=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        if sid:
+            self.send_header("Set-Cookie", f"sid={sid}; Path=/; HttpOnly")
+        self.end_headers()
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    # ---------- 路由 ----------
+    def do_GET(self):
+        self.site.stats['requests'] += 1
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        sid, session = self._session()
+        user = session['user']
+
+        if url.path in ("/", "/login"):
+            return self._send(LOGIN_HTML, sid=sid)
+        if url.path == "/captcha.png":
+            session['captcha'] = "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
+            return self._send(make_captcha(session['captcha']), "image/png", sid=sid)
+        if url.path.startswith("/media/") and url.path.endswith(".wav"):
+            return self._send(make_wav(self.site.options['video_seconds']), "audio/wav")
+        if user is None:
+            return self._redirect("/login", sid)
+
+        if url.path == "/home":
+            return self._send(HOME_HTML)
+        if url.path == "/courses":
+            page = int(query.get("page", 1))
+            return self._send(COURSES_HTML.replace("__PAGES__", str(self.site.options['pages'])).replace("__PAGE__", str(page)))
+        if url.path == "/course/list":
+            courses = self.site.page_courses(int(query.get("page", 1)))
+            items = [{'id': c['id'], 'name': c['name'], 'studyStatus': "已完成" if self.site.completed(user, c['id']) else "未完成"}
+                     for c in courses]
+            return self._json({'data': {'list': items}})
+        if url.path == "/course/status":
+            time.sleep(self.site.options['status_delay_ms'] / 1000)
+            courses = self.site.page_courses(int(query.get("page", 1)))
+            return self._json({c['id']: self.site.completed(user, c['id']) for c in courses})
+        if url.path in ("/video", "/player"):
+            course = self.site.courses.get(query.get("id"))
+            if not course:
+                return self._send("not found", status=404)
+            if url.path == "/video":
+                return self._send(VIDEO_HTML.replace("__TITLE__", course['name']).replace("__ID__", course['id']))
+            seconds = self.site.options['video_seconds']
+            width, height, pixels = play_button_pixels()
+            return self._send(PLAYER_HTML.replace("__ID__", course['id'])
+                              .replace("__PLAY_WIDTH__", str(width)).replace("__PLAY_HEIGHT__", str(height))
+                              .replace("__PLAY_PIXELS__", pixels)
+                              .replace("__STATUS__", "已完成" if self.site.completed(user, course['id']) else "未完成")
+                              .replace("__DURATION__", f"{int(seconds // 60)}:{int(seconds % 60):02d}"))
+        self._send("not found", status=404)
+
+    def do_POST(self):
+        self.site.stats['requests'] += 1
+        url = urlparse(self.path)
+        sid, session = self._session()
+
+        if url.path == "/api/login":
+            form = {k: v[0] for k, v in parse_qs(self._body().decode("utf-8")).items()}
+            captcha_ok = not self.site.options['require_captcha'] or (
+                session['captcha'] and form.get("captcha", "").upper() == session['captcha'])
+            session['captcha'] = None  # 验证码只能用一次
+            if not form.get("username") or not form.get("password") or not captcha_ok:
+                return self._json({'ok': False}, 401, sid)
+            session['user'] = form["username"]
+            self.site.stats['logins'] += 1
+            return self._json({'ok': True}, sid=sid)
+        if url.path == "/study/progress":
+            if session['user'] is None:
+                return self._json({'ok': False}, 401)
+            course_id = json.loads(self._body() or b"{}").get("courseId")
+            if course_id not in self.site.courses:
+                return self._json({'ok': False}, 404)
+            self.site.complete(session['user'], course_id)
+            return self._json({'data': {'courseId': course_id, 'finished': True}})
+        self._send("not found", status=404)
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **options):
+    """在后台线程启动站点，返回 (server, site, base_url)；port=0 时随机分配端口"""
+    site = FixtureSite(**options)
+    handler = type("FixtureHandler", (Handler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, site, f"http://{host}:{server.server_address[1]}"
+
+def site_config(base_url: str, **overrides) -> dict:
+    """main-sens.py 的 CONFIG 中需要指向本地站点的键"""
+    return {
+        'login_url': f"{base_url}/login",
+        'page_url_template': None,
+        'page_number_selector': ".pagination li:text-is('{page}')",
+        'page_timeout': 3,
+        'max_video_seconds': DEFAULTS['video_seconds'] * 5,
+        'verify_seconds': 5,
+        'poll_seconds': 1,
+        'skip_courses': [],
+        **overrides,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地的培训站点，供压测和调试使用")
+    parser.add_argument("--port", type=int, default=8765)
+    for key, value in DEFAULTS.items():
+        if isinstance(value, bool):
+            parser.add_argument(f"--{key.replace('_', '-')}", action="store_true", default=value)
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = vars(parser.parse_args())
+    port = args.pop("port")
+    server, site, base_url = start_server(port=port, **args)
+    print(f"本地培训站点已启动: {base_url}/login （Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口名 -> 冷启动时执行的导入语句；main-sens.py 文件名带横线，按路径加载
+ENTRY_POINTS = {
+    "auto_tools": "import auto_tools",
+    "main-sens": (
+        "import importlib.util\n"
+        "spec = importlib.util.spec_from_file_location('main_sens', 'main-sens.py')\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+    ),
+    "multi_account": "import multi_account",
+    "template_match": "import template_match",
+    "retry_policy": "import retry_policy",
+    "course_store": "import course_store",
+}
+
+# 测量代码：在全新的解释器里只对导入计时，不包含解释器本身的启动
+PROBE = """
+import time
+_start = time.perf_counter()
+exec(compile({code!r}, '<entry>', 'exec'))
+print(time.perf_counter() - _start)
+"""
+
+def measure(code: str, repeat: int = 5) -> list:
+    """在新进程中重复导入 repeat 次，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(code=code)], cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit code {out.returncode}")
+        timings.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+def heavy_modules(code: str) -> list:
+    """导入入口之后，哪些重依赖被（不必要地）加载了"""
+    heavy = ["cv2", "numpy", "ddddocr", "onnxruntime", "selenium", "pyautogui", "requests", "imagehash", "playwright", "PIL", "asyncio"]
+    probe = f"import sys\nexec(compile({code!r}, '<entry>', 'exec'))\nprint(' '.join(m for m in {heavy!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True)
+    return out.stdout.split() if out.returncode == 0 else []
+
+def main():
+    parser = argparse.ArgumentParser(description="测量各入口的冷启动导入耗时，超出预算时返回非0退出码")
+    parser.add_argument("entries", nargs="*", default=list(ENTRY_POINTS), help=f"要测的入口，默认全部: {', '.join(ENTRY_POINTS)}")
+    parser.add_argument("--budget", type=float, default=150, help="每个入口的导入耗时预算（毫秒，取中位数比较）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口测量次数")
+    parser.add_argument("--json", dest="json_path", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    results, over = [], []
+    for name in args.entries:
+        code = ENTRY_POINTS[name]
+        try:
+            timings = measure(code, args.repeat)
+        except RuntimeError as e:
+            print(f"{name}: 导入失败 {e}")
+            results.append({'entry': name, 'error': str(e)})
+            over.append(name)
+            continue
+        median = statistics.median(timings)
+        loaded = heavy_modules(code)
+        results.append({'entry': name, 'median_ms': median, 'min_ms': min(timings), 'max_ms': max(timings),
+                        'budget_ms': args.budget, 'heavy_modules': loaded})
+        status = "OK" if median <= args.budget else "超出预算"
+        print(f"{name}: 中位数 {median:.1f}ms（最快 {min(timings):.1f}ms）{status}  已加载的重依赖: {', '.join(loaded) or '无'}")
+        if median > args.budget:
+            over.append(name)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if over:
+        print(f"超出预算或导入失败: {', '.join(over)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 脚本都在仓库根目录
+
+import numpy as np
+import cv2
+import trah
+import auto_tools
+from multi_account import Scheduler, load_main_sens
+from fixture_site import start_server, site_config
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测函数里的print，不让输出本身影响计时"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+# ========== 微基准 ==========
+def _time(fn, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()  # 每轮至少跑0.2秒
+    times = [t / loops * 1e6 for t in timer.repeat(repeat, loops)]
+    return {'best_us': min(times), 'median_us': statistics.median(times), 'loops': loops}
+
+def _synthetic_frames(n: int, size=(360, 640), seed: int = 0) -> list:
+    """生成n帧带噪声渐变的PNG，模拟视频截图"""
+    rng = np.random.default_rng(seed)
+    base = np.tile(np.linspace(0, 255, size[1], dtype=np.float32), (size[0], 1))
+    frames = []
+    for i in range(n):
+        img = np.clip(base + rng.normal(0, 20, size) + i * 3, 0, 255).astype(np.uint8)
+        frames.append(cv2.imencode(".png", cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))[1].tobytes())
+    return frames
+
+def micro_benchmarks(repeat: int = 5) -> dict:
+    main_sens = load_main_sens()
+    frames = _synthetic_frames(33)
+    reference, stack = trah.decode_gray(frames[0]), trah.load_gray_stack(frames[1:])
+    rng = np.random.default_rng(1)
+    captcha = rng.integers(0, 256, (40, 120, 3), dtype=np.uint8)
+    captchas = rng.integers(0, 256, (64, 40, 120, 3), dtype=np.uint8)
+
+    cases = {
+        'compare_phash': lambda: main_sens.compare_phash(frames[0], frames[1]),
+        'trah.phash_similarity[32]': lambda: trah.phash_similarity(reference, stack),
+        'trah.ssim_batch[32]': lambda: trah.ssim_batch(reference, stack),
+        'trah.mse_batch[32]': lambda: trah.mse_batch(reference, stack),
+        'trah.compare_batch[32]': lambda: trah.compare_batch(frames[0], frames[1:]),
+        'adjust_contrast': lambda: auto_tools.adjust_contrast(captcha),
+        'adjust_contrast[64]': lambda: auto_tools.adjust_contrast(captchas, inplace=True),
+        'convert_duration_to_seconds': lambda: main_sens.convert_duration_to_seconds("1:02:03"),
+    }
+    results = {}
+    for name, fn in cases.items():
+        with quiet():
+            results[name] = _time(fn, repeat)
+        print(f"{name}: {results[name]['best_us']:.1f}us")
+    return results
+
+# ========== 分阶段计时 ==========
+def stage_benchmarks(base_url: str, runs: int = 3) -> list:
+    """在本地站点上按 login → 课程页 → 列表 → 翻页 → 列表 → 播放一个视频 的顺序给每个环节计时"""
+    main_sens = load_main_sens()
+    config = {**main_sens.CONFIG, **site_config(base_url)}
+    results = []
+    with main_sens.playwright_api.sync_playwright() as p:
+        browser = p.firefox.launch(headless=True, firefox_user_prefs=main_sens.lean_firefox_prefs(config))
+        for run in range(runs):
+            context = browser.new_context()
+            page = context.new_page()
+            timings = {}
+
+            def stage(name, fn, *args):
+                start = time.perf_counter()
+                with quiet():
+                    result = fn(*args)
+                timings[name] = time.perf_counter() - start
+                return result
+
+            stage('login', main_sens.login, page, config, f"stage-{run}", "password")
+            stage('navigate_to_courses', main_sens.navigate_to_courses, page, config)
+            pager = main_sens.Pager(page, config)
+            stage('list_courses', main_sens.list_courses, pager, config, 1)
+            stage('switch_to_page_num', pager.goto, 2)
+            unfinished = stage('list_courses_page2', main_sens.list_courses, pager, config, 2)
+            if unfinished:
+                played = stage('play_video', main_sens.play_video, page, unfinished[0], config, True)
+                timings['play_video_ok'] = bool(played)
+            context.close()
+            results.append(timings)
+            print(f"第{run + 1}轮: " + "，".join(f"{k} {v:.2f}s" for k, v in timings.items() if isinstance(v, float)))
+        browser.close()
+    return results
+
+# ========== 整体运行 ==========
+def run_benchmarks(base_url: str, site, levels: list, accounts: int, max_parallel_videos: int) -> list:
+    """不同并发数下完整跑完多个账号的耗时，每个并发档位用新的账号，站点上的学习记录互不影响"""
+    results = []
+    for level in levels:
+        overrides = site_config(base_url, lean_profile=True, headless=True, max_parallel_videos=max_parallel_videos)
+        account_list = [{'username': f"run-{level}-{i}", 'password': "password", 'config': overrides} for i in range(accounts)]
+        completions_before = site.stats['completions']
+        with tempfile.TemporaryDirectory() as state_dir:
+            start = time.perf_counter()
+            done = Scheduler(account_list, state_dir, max_browsers=level, retries=0).run()
+            elapsed = time.perf_counter() - start
+        results.append({'concurrency': level, 'accounts': accounts, 'seconds': elapsed,
+                        'finished_accounts': sum(done.values()),
+                        'completed_videos': site.stats['completions'] - completions_before})
+        print(f"并发{level}: {accounts}个账号用时{elapsed:.1f}s，学完{sum(done.values())}个")
+    return results
+
+# ========== 结果对比 ==========
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """和之前的结果对比，返回变慢超过 tolerance 倍的项目"""
+    regressions = []
+    for name, current in results.get('micro', {}).items():
+        old = baseline.get('micro', {}).get(name)
+        if old and current['best_us'] > old['best_us'] * tolerance:
+            regressions.append(f"{name}: {old['best_us']:.1f}us -> {current['best_us']:.1f}us")
+    if results.get('stages') and baseline.get('stages'):
+        for name in results['stages'][0]:
+            if not isinstance(results['stages'][0][name], float) or name not in baseline['stages'][0]:
+                continue
+            now = statistics.median(r[name] for r in results['stages'] if name in r)
+            old = statistics.median(r[name] for r in baseline['stages'] if name in r)
+            if now > old * tolerance:
+                regressions.append(f"{name}: {old:.2f}s -> {now:.2f}s")
+    return regressions
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地站点上压测各个环节，并对关键函数做微基准，结果写入JSON")
+    parser.add_argument("--output", default="bench_results.json", help="结果JSON文件")
+    parser.add_argument("--baseline", help="之前的结果JSON，变慢超过 --tolerance 倍时返回非0退出码")
+    parser.add_argument("--tolerance", type=float, default=1.2)
+    parser.add_argument("--repeat", type=int, default=5, help="微基准的重复次数")
+    parser.add_argument("--micro-only", action="store_true", help="只做微基准，不启动浏览器")
+    parser.add_argument("--stage-runs", type=int, default=3, help="分阶段计时的轮数")
+    parser.add_argument("--levels", type=int, nargs="*", default=[1, 2, 4], help="整体运行时的并发浏览器数")
+    parser.add_argument("--accounts", type=int, default=4, help="每个并发档位跑的账号数")
+    parser.add_argument("--max-parallel-videos", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--cards-per-page", type=int, default=6)
+    parser.add_argument("--video-seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    results = {'meta': {'commit': _git_commit(), 'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+                        'python': platform.python_version(), 'platform': platform.platform(), 'args': vars(args)}}
+    print("== 微基准 ==")
+    results['micro'] = micro_benchmarks(args.repeat)
+
+    if not args.micro_only:
+        server, site, base_url = start_server(pages=args.pages, cards_per_page=args.cards_per_page, video_seconds=args.video_seconds)
+        try:
+            print(f"== 分阶段计时（{base_url}）==")
+            results['stages'] = stage_benchmarks(base_url, args.stage_runs)
+            print("== 整体运行 ==")
+            results['runs'] = run_benchmarks(base_url, site, args.levels, args.accounts, args.max_parallel_videos)
+        finally:
+            server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"变慢: {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
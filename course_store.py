@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from typing import Optional
+
+class CourseStore:
+    """
+    本地课程状态缓存，JSON Lines 格式，每行一条课程记录，后写的行覆盖先写的。
+
+    记录字段: title, page, done, duration, updated_at
+    """
+    def __init__(self, path: str = "course_state.jsonl"):
+        self.path = path
+        self.courses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 上次运行中断时可能留下半行
+                    self.courses.setdefault(record['title'], {}).update(record)
+
+    def get(self, title: str) -> Optional[dict]:
+        return self.courses.get(title)
+
+    def is_done(self, title: str, max_age_hours: Optional[float] = None) -> bool:
+        """课程是否已完成；给了max_age_hours时，过期的完成记录视为需要重新确认"""
+        record = self.courses.get(title)
+        if not record or not record.get('done'):
+            return False
+        return max_age_hours is None or time.time() - record['updated_at'] < max_age_hours * 3600
+
+    def update(self, title: str, touch: bool = False, **fields):
+        """合并字段并追加写入一行，字段没有变化且不要求刷新时间时不写盘"""
+        record = self.courses.get(title, {'title': title})
+        if not touch and all(record.get(k) == v for k, v in fields.items()):
+            return
+        record = {**record, **fields, 'updated_at': time.time()}
+        self.courses[title] = record
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def mark_seen(self, title: str, page_num: int, completed: bool):
+        """列表页上看到课程时调用；页面显示未完成不会覆盖本地的完成记录"""
+        if completed:
+            self.update(title, page=page_num, done=True)
+        else:
+            self.update(title, page=page_num)
+
+    def mark_done(self, title: str, duration: Optional[float] = None):
+        fields = {'done': True}
+        if duration is not None:
+            fields['duration'] = duration
+        self.update(title, touch=True, **fields)
+
+    def pending(self, skip: Optional[list] = None) -> list:
+        """列表页上见过、还没完成的课程（不含skip中的课程）"""
+        skip = set(skip or [])
+        return [r['title'] for r in self.courses.values() if 'page' in r and not r.get('done') and r['title'] not in skip]
+
+    def first_pending_page(self, default: int = 1, skip: Optional[list] = None) -> int:
+        """还有未完成课程（不含skip中的课程）的最小页码；全部完成时返回最后见过的页，从那里继续往后翻"""
+        pages = [self.courses[title]['page'] for title in self.pending(skip)]
+        if pages:
+            return min(pages)
+        seen = [r['page'] for r in self.courses.values() if 'page' in r]
+        return max(seen) if seen else default
+
+    def compact(self):
+        """重写文件，每门课程只保留最新一行"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.courses.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
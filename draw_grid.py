@@ -1,19 +1,86 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import matplotlib.pyplot as plt
 import numpy as np
 
-def plot_accuracy(ax, config, show_legend=False):
+############################长序列降采样##################################
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标，能保住曲线的峰谷形状。
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # 中间的点均分成 n_out-2 个桶，首尾两点固定保留
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # 每个桶的均值点，用作下一个桶选点时三角形的第三个顶点
+    sums_x, sums_y = np.add.reduceat(x[1:n - 1], edges[:-1] - 1), np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x, avg_y = np.append(sums_x / counts, x[-1])[1:], np.append(sums_y / counts, y[-1])[1:]
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+def minmax_indices(y, max_points):
+    """每个桶保留最小值和最大值两个点，再加上首尾两点，总数不超过 max_points；适合噪声大、需要保住极值的曲线"""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    n_buckets = (max_points - 2) // 2  # 首尾两点单独占名额
+    if n_buckets < 1:
+        return np.unique(np.linspace(0, n - 1, max_points).astype(int))
+    size = n // n_buckets
+    body = y[:size * n_buckets].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    picks = np.concatenate([offsets + body.argmin(axis=1), offsets + body.argmax(axis=1), [0, n - 1]])
+    return np.unique(picks)
+
+def downsample_series(x, y, max_points, method='lttb'):
+    """把一条曲线降到不超过 max_points 个点，x、y 为 NumPy 数组"""
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    indices = lttb_indices(x, y, max_points) if method == 'lttb' else minmax_indices(y, max_points)
+    return x[indices], y[indices]
+
+def plot_accuracy(ax, config, show_legend=False, max_points=2000, downsample='lttb', rasterize_above=5000):
     """
     绘制单个子图的准确率曲线。
     
     参数:
     - ax: 子图对象。
-    - config: 配置字典，包括 accuracies, times, colors, markers, labels 等信息。
+    - config: 配置字典，包括 accuracies, times, colors, markers, labels 等信息；times 和 accuracies 可以是列表或 NumPy 数组。
+      配置中的 max_points, downsample, rasterize_above 会覆盖同名参数。
     - show_legend: 是否显示图例。
+    - max_points: 每条曲线最多绘制的点数，超过时降采样，None 表示不降采样。
+    - downsample: 降采样方法，'lttb' 或 'minmax'。
+    - rasterize_above: 原始点数超过该值的曲线栅格化，坐标轴和文字仍是矢量，None 表示不栅格化。
     """
+    max_points = config.get('max_points', max_points)
+    downsample = config.get('downsample', downsample)
+    rasterize_above = config.get('rasterize_above', rasterize_above)
+    times = np.asarray(config['times'], dtype=float)
+
     # 绘制每一条线
     for i, (accuracy, color, marker, label) in enumerate(zip(config['accuracies'], config['colors'], config['markers'], config['labels'])):
         linestyle = '--' if i == 1 or i == 3 else '-'
-        ax.plot(config['times'], accuracy, marker=marker, color=color, label=label, linewidth=1.5, linestyle=linestyle)
+        accuracy = np.asarray(accuracy, dtype=float)
+        x, y = downsample_series(times, accuracy, max_points, downsample)
+        dense = rasterize_above is not None and len(accuracy) > rasterize_above
+        ax.plot(x, y, marker=marker, color=color, label=label, linewidth=1.5, linestyle=linestyle,
+                markevery=max(1, len(x) // 10), rasterized=dense)
 
     # 显示图例
     if show_legend:
@@ -22,14 +89,15 @@ def plot_accuracy(ax, config, show_legend=False):
     # 设置子图属性
     ax.set_xlabel('Eavesdropping Duration(s)')
     ax.set_ylabel(f"Accuracy in {config['scenario']} Scenario")
-    ax.set_xticks(config['times'])
+    if len(times) <= 20:
+        ax.set_xticks(times)
     ax.set_yticks(np.linspace(0, 1, 11))
     ax.set_ylim(0, 1)
     ax.grid(True, linestyle='--', linewidth=1.0, color='gray')
 
-def plot_multiple_accuracies(scenario_configs):
+def build_vertical_figure(scenario_configs):
     """
-    绘制多个垂直排列的准确率子图。
+    创建多个垂直排列的准确率子图，返回 figure。
 
     参数:
     - scenario_configs: 子图配置的列表，每个配置是一个字典，包含 accuracies, times, colors, markers, labels, scenario 和 show_legend 等信息。
@@ -46,15 +114,29 @@ def plot_multiple_accuracies(scenario_configs):
         plot_accuracy(ax, config, show_legend=config.get('show_legend', False))
 
     # 调整子图间的间距
-    plt.tight_layout()
+    fig.tight_layout()
+    return fig
+
+def plot_multiple_accuracies(scenario_configs, output_path=r'data/multi_comp_group_vertical.pdf', show=True):
+    """
+    绘制多个垂直排列的准确率子图。
+
+    参数:
+    - scenario_configs: 子图配置的列表，每个配置是一个字典，包含 accuracies, times, colors, markers, labels, scenario 和 show_legend 等信息。
+    - output_path: 保存路径。
+    - show: 是否弹出窗口显示（无头环境下设为False）。
+    """
+    fig = build_vertical_figure(scenario_configs)
 
     # 保存图形
-    plt.savefig(r'data/multi_comp_group_vertical.pdf', bbox_inches='tight')
-    plt.show()
+    fig.savefig(output_path, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close(fig)
 
-def plot_grid_accuracies(scenario_configs, ncols=2):
+def build_grid_figure(scenario_configs, ncols=2):
     """
-    绘制一个网格排列的子图，可以指定每行显示的子图数。
+    创建一个网格排列的子图，可以指定每行显示的子图数，返回 figure。
 
     参数:
     - scenario_configs: 子图配置的列表，每个配置是一个字典，包含 accuracies, times, colors, markers, labels, scenario 和 show_legend 等信息。
@@ -82,11 +164,154 @@ def plot_grid_accuracies(scenario_configs, ncols=2):
         fig.delaxes(axs[j // ncols][j % ncols])
 
     # 调整子图间的间距
-    plt.tight_layout()
+    fig.tight_layout()
+    return fig
+
+def plot_grid_accuracies(scenario_configs, ncols=2, output_path=r'data/multi_comp_group_grid.pdf', show=True):
+    """
+    绘制一个网格排列的子图，可以指定每行显示的子图数。
+
+    参数:
+    - scenario_configs: 子图配置的列表，每个配置是一个字典，包含 accuracies, times, colors, markers, labels, scenario 和 show_legend 等信息。
+    - ncols: 每行的子图数量。
+    - output_path: 保存路径。
+    - show: 是否弹出窗口显示（无头环境下设为False）。
+    """
+    fig = build_grid_figure(scenario_configs, ncols)
 
     # 保存图形
-    plt.savefig(r'data/multi_comp_group_grid.pdf', bbox_inches='tight')
-    plt.show()
+    fig.savefig(output_path, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close(fig)
+
+############################批量绘图##################################
+# 一个绘图任务 (job) 是一个字典:
+# {'output': 'xxx.pdf', 'layout': 'grid' 或 'vertical', 'ncols': 2, 'style': {rcParams}, 'scenarios': [子图配置, ...]}
+CACHE_FILE = '.render_cache.json'
+
+def load_jobs(path):
+    """
+    从 JSON 或 CSV 文件读取绘图任务。
+
+    - JSON: 一个任务字典或任务列表；没写 output 时用文件名。
+    - CSV: 一个文件一张图，列为 scenario, label, color, marker，其余列名是时间点、值是准确率；
+      同一 scenario 的行画在同一个子图里，第一个子图显示图例。
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith('.csv'):
+        scenarios = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            time_columns = [c for c in reader.fieldnames if c not in ('scenario', 'label', 'color', 'marker')]
+            for row in reader:
+                config = scenarios.setdefault(row['scenario'], {
+                    'times': [float(t) for t in time_columns], 'accuracies': [], 'colors': [], 'markers': [],
+                    'labels': [], 'scenario': row['scenario'], 'show_legend': not scenarios,
+                })
+                config['accuracies'].append([float(row[t]) for t in time_columns])
+                config['colors'].append(row['color'])
+                config['markers'].append(row['marker'])
+                config['labels'].append(row['label'])
+        return [{'output': f'{stem}.pdf', 'layout': 'grid', 'scenarios': list(scenarios.values())}]
+
+    with open(path, encoding='utf-8') as f:
+        jobs = json.load(f)
+    jobs = jobs if isinstance(jobs, list) else [jobs]
+    for i, job in enumerate(jobs):
+        job.setdefault('output', f'{stem}.pdf' if len(jobs) == 1 else f'{stem}_{i}.pdf')
+    return jobs
+
+def _code_hash():
+    """绘图代码本身的哈希，修改绘图样式后所有图都会重画"""
+    with open(__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _array_digest(value):
+    """NumPy 数组按内容取哈希，不转成列表"""
+    if isinstance(value, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest() + str(value.dtype) + str(value.shape)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def job_hash(job, code_hash=None):
+    """任务输入（数据和样式）加绘图代码的哈希"""
+    payload = json.dumps(job, sort_keys=True, ensure_ascii=False, default=_array_digest) + (code_hash or _code_hash())
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+@contextmanager
+def job_figure(job):
+    """在任务样式下绘制图形，样式覆盖到保存为止（savefig.* 参数也生效），退出时关闭图形"""
+    with plt.rc_context(job.get('style', {})):
+        if job.get('layout', 'grid') == 'vertical':
+            fig = build_vertical_figure(job['scenarios'])
+        else:
+            fig = build_grid_figure(job['scenarios'], job.get('ncols', 2))
+        try:
+            yield fig
+        finally:
+            plt.close(fig)
+
+def render_job(job, out_dir):
+    """在子进程中用 Agg 后端渲染一个任务，返回输出路径"""
+    plt.switch_backend('Agg')
+    output_path = os.path.join(out_dir, job['output'])
+    with job_figure(job) as fig:
+        fig.savefig(output_path, bbox_inches='tight')
+    return output_path
+
+def render_batch(jobs, out_dir='data', workers=None, force=False):
+    """
+    用进程池并行渲染一批任务，输入和样式都没变的图直接跳过。
+
+    返回: (重新渲染的输出路径列表, 跳过的输出路径列表)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cache_path = os.path.join(out_dir, CACHE_FILE)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+
+    code_hash = _code_hash()
+    todo, skipped = [], []
+    for job in jobs:
+        digest = job_hash(job, code_hash)
+        output_path = os.path.join(out_dir, job['output'])
+        if not force and cache.get(job['output']) == digest and os.path.exists(output_path):
+            skipped.append(output_path)
+        else:
+            todo.append((job, digest))
+
+    rendered = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for (job, digest), output_path in zip(todo, executor.map(render_job, [j for j, _ in todo], [out_dir] * len(todo))):
+                cache[job['output']] = digest
+                rendered.append(output_path)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+    return rendered, skipped
+
+def combine_pdf(jobs, out_dir, combined_path):
+    """把一批任务的输出合并成一个多页PDF；装了 pypdf 时直接合并已有文件，否则重新绘制到 PdfPages"""
+    paths = [os.path.join(out_dir, job['output']) for job in jobs]
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        from matplotlib.backends.backend_pdf import PdfPages
+        plt.switch_backend('Agg')
+        with PdfPages(combined_path) as pdf:
+            for job in jobs:
+                with job_figure(job) as fig:
+                    pdf.savefig(fig, bbox_inches='tight')
+        return combined_path
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(combined_path, 'wb') as f:
+        writer.write(f)
+    return combined_path
 
 
 
@@ -130,5 +355,25 @@ scenario_configs = [
     },
 ]
 ############################绘制多个子图##################################
-plot_multiple_accuracies(scenario_configs)
-plot_grid_accuracies(scenario_configs)
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="批量渲染准确率图，不带参数时绘制内置示例")
+    parser.add_argument("configs", nargs="*", help="JSON/CSV 配置文件，支持通配符")
+    parser.add_argument("--out", default="data", help="输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument("--combine", help="把所有输出合并成一个多页PDF")
+    parser.add_argument("--force", action="store_true", help="忽略缓存全部重画")
+    args = parser.parse_args()
+
+    if not args.configs:
+        plot_multiple_accuracies(scenario_configs)
+        plot_grid_accuracies(scenario_configs)
+        return
+
+    jobs = [job for pattern in args.configs for path in sorted(glob.glob(pattern)) for job in load_jobs(path)]
+    rendered, skipped = render_batch(jobs, args.out, args.workers, args.force)
+    print(f"渲染 {len(rendered)} 张，跳过未变化的 {len(skipped)} 张")
+    if args.combine:
+        print(f"合并为 {combine_pdf(jobs, args.out, args.combine)}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
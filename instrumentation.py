@@ -0,0 +1,183 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# ========== 计时与追踪 ==========
+# 直方图的桶上界（秒），对数刻度，从1ms到2小时
+BUCKETS = [0.001 * 2 ** i for i in range(23)]
+
+class Tracer:
+    """
+    记录带嵌套关系的计时区间（span），按操作名汇总直方图，可以导出成 JSON lines 和 Chrome trace 格式。
+
+    - 同一线程里 with tracer.span(...) 嵌套使用时自动记录父子关系。
+    - 跨多次调用的区间（比如同时播放的几个视频）用 record(name, start, end, track=...) 手动记录，
+      同一个 track 的区间在 trace 查看器里显示在同一行，按时间自然嵌套。
+    - 给了 jsonl_path 时每个 span 结束就追加写入，长时间运行中途崩溃也不会丢数据。
+    """
+    def __init__(self, jsonl_path: Optional[str] = None):
+        self.origin = time.perf_counter()
+        self.origin_wall = time.time()
+        self.spans = []
+        self.stats = {}  # name -> {'count', 'total', 'max', 'durations'}
+        self.jsonl_path = jsonl_path
+        self._tracks = {}  # track名 -> 数字id（Chrome trace 的 tid）
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter()
+
+    def _track_id(self, track) -> int:
+        if track not in self._tracks:
+            self._tracks[track] = len(self._tracks) + 1
+        return self._tracks[track]
+
+    def record(self, name: str, start: float, end: Optional[float] = None, track: Optional[str] = None, **attrs) -> dict:
+        """记录一个区间，start/end 是 perf_counter 的值；track 为None时记在当前线程上"""
+        end = self.now() if end is None else end
+        stack = getattr(self._local, 'stack', [])
+        span = {
+            'name': name,
+            'start': start - self.origin,
+            'duration': end - start,
+            'depth': len(stack) if track is None else None,
+            'parent': stack[-1] if stack and track is None else None,
+            'track': track or threading.current_thread().name,
+            'attrs': attrs,
+        }
+        with self._lock:
+            span['tid'] = self._track_id(span['track'])
+            self.spans.append(span)
+            stat = self.stats.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'durations': []})
+            stat['count'] += 1
+            stat['total'] += span['duration']
+            stat['max'] = max(stat['max'], span['duration'])
+            stat['durations'].append(span['duration'])
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """with tracer.span("login"): ...，出异常时也会记录，并在attrs里标上error"""
+        stack = self._local.__dict__.setdefault('stack', [])
+        start = self.now()
+        stack.append(name)
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            self.record(name, start, **attrs)
+
+    def timed(self, name: Optional[str] = None, echo: bool = False):
+        """装饰器版本的span，name默认用函数名；echo=True时像以前一样打印耗时"""
+        return _timed_decorator(lambda: self, name, echo)
+
+    # ---------- 汇总 ----------
+    def summary(self) -> dict:
+        """每个操作的次数、总耗时、分位数和对数刻度直方图 {'<=1ms': 次数, ...}"""
+        result = {}
+        with self._lock:
+            items = [(name, dict(stat, durations=sorted(stat['durations']))) for name, stat in self.stats.items()]
+        for name, stat in items:
+            durations = stat['durations']
+            pick = lambda q: durations[min(len(durations) - 1, int(q * len(durations)))]
+            histogram = {}
+            for d in durations:
+                i = bisect.bisect_left(BUCKETS, d)
+                label = f"<={_format_seconds(BUCKETS[i])}" if i < len(BUCKETS) else f">{_format_seconds(BUCKETS[-1])}"
+                histogram[label] = histogram.get(label, 0) + 1
+            result[name] = {
+                'count': stat['count'], 'total': stat['total'], 'mean': stat['total'] / stat['count'],
+                'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': stat['max'], 'histogram': histogram,
+            }
+        return result
+
+    def report(self):
+        """按总耗时从多到少打印每个操作的统计"""
+        summary = sorted(self.summary().items(), key=lambda item: item[1]['total'], reverse=True)
+        if not summary:
+            return
+        print(f"{'操作':<20}{'次数':>6}{'总耗时':>10}{'平均':>10}{'p50':>10}{'p90':>10}{'最大':>10}")
+        for name, s in summary:
+            print(f"{name:<20}{s['count']:>6}" + "".join(f"{_format_seconds(s[k]):>10}" for k in ('total', 'mean', 'p50', 'p90', 'max')))
+
+    # ---------- 导出 ----------
+    def export_jsonl(self, path: str):
+        """每个span一行JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            for span in self.spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+
+    def export_chrome_trace(self, path: str):
+        """导出成 Chrome trace-event 格式，可以用 chrome://tracing 或 ui.perfetto.dev 打开"""
+        pid = os.getpid()
+        events = [{'name': "thread_name", 'ph': "M", 'pid': pid, 'tid': tid, 'args': {'name': str(track)}}
+                  for track, tid in self._tracks.items()]
+        for span in self.spans:
+            events.append({
+                'name': span['name'], 'ph': "X", 'pid': pid, 'tid': span['tid'],
+                'ts': span['start'] * 1e6, 'dur': span['duration'] * 1e6,
+                'args': {k: str(v) for k, v in span['attrs'].items()},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': "ms",
+                       'otherData': {'start_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.origin_wall))}},
+                      f, ensure_ascii=False)
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms" if seconds >= 0.001 else f"{seconds * 1e6:.0f}us"
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    return f"{seconds / 60:.1f}min"
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """进程内共享的 Tracer"""
+    return _tracer
+
+def reset_tracer(jsonl_path: Optional[str] = None) -> Tracer:
+    """换一个新的 Tracer（比如每个账号一份追踪记录）；已经用 span/timed 装饰的函数会自动记到新的里面"""
+    global _tracer
+    _tracer = Tracer(jsonl_path)
+    return _tracer
+
+def span(name: str, **attrs):
+    """with span("list_courses", page=3): ...，记到共享的 Tracer 里"""
+    return _tracer.span(name, **attrs)
+
+def _timed_decorator(tracer_of, name: Optional[str], echo: bool):
+    def decorator(func):
+        span_name = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = tracer_of()
+            start = tracer.now()
+            with tracer.span(span_name):
+                result = func(*args, **kwargs)
+            if echo:
+                print(f"Execution time: {tracer.now() - start:.2f}s")
+            return result
+        return wrapper
+    return decorator
+
+def timed(name: Optional[str] = None, echo: bool = False):
+    """@timed() 或 @timed("login")，每次调用时记到当时共享的 Tracer 里"""
+    return _timed_decorator(get_tracer, name, echo)
+
+def execution_time_decorator(func):
+    """用于装饰器，计算函数执行时间（打印耗时，同时记录span）"""
+    return timed(echo=True)(func)
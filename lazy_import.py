@@ -0,0 +1,62 @@
+import importlib
+import sys
+import threading
+import types
+
+# ========== 延迟导入 ==========
+class LazyModule(types.ModuleType):
+    """
+    模块代理：第一次访问属性时才真正导入，之后直接转发到真实模块。
+
+    用于 cv2、ddddocr（onnxruntime）、selenium 这类导入很慢、但很多脚本用不到的依赖。
+    导入失败（包括 pyautogui 在没有显示器的机器上抛出的 KeyError 等非 ImportError 异常）
+    统一转成 ImportError，并在第一次用到时才抛出，所以不用它的代码路径完全不受影响。
+    """
+    def __init__(self, name: str, hint: str = ""):
+        super().__init__(name)
+        self.__dict__['_lazy_hint'] = hint
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    try:
+                        module = importlib.import_module(self.__name__)
+                    except Exception as e:
+                        hint = self.__dict__['_lazy_hint']
+                        raise ImportError(f"无法导入 {self.__name__}{'（' + hint + '）' if hint else ''}: {e!r}") from e
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_lazy_module'] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_import(name: str, hint: str = "") -> types.ModuleType:
+    """
+    返回模块本身（已经导入过时）或它的延迟代理。
+
+    用法: cv2 = lazy_import("cv2")，之后和普通模块一样用 cv2.imdecode(...)。
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name, hint)
+
+def is_available(module: types.ModuleType) -> bool:
+    """可选依赖是否能用（会触发导入），比如没有显示器时 pyautogui 返回False"""
+    try:
+        if isinstance(module, LazyModule):
+            module._load()
+        return True
+    except ImportError:
+        return False
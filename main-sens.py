@@ -1,23 +1,78 @@
-import imagehash
-from PIL import Image
-from playwright.sync_api import sync_playwright
-import pyautogui
+import io
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+from course_store import CourseStore
+from instrumentation import get_tracer, reset_tracer, timed
+from lazy_import import lazy_import
+from template_match import get_matcher
+from retry_policy import CircuitOpenError, get_breaker
 
-def _locate_image(image_path: str, confidence: float = 0.8):
-    location = pyautogui.locateCenterOnScreen(image_path, confidence=confidence)
-    return location
+# 重依赖用到时才导入：无头模式不会碰 pyautogui（也就不需要显示器），多账号的工作进程启动更快
+imagehash = lazy_import("imagehash")
+Image = lazy_import("PIL.Image")
+pyautogui = lazy_import("pyautogui", "需要图形界面，无头模式不会用到")
+playwright_api = lazy_import("playwright.sync_api")
 
-def click_image(image_path: str, confidence: float = 0.8) -> bool:
-    location = _locate_image(image_path, confidence)
+def _locate_image(image_path: str, confidence: float = 0.8, region=None):
+    found = get_matcher((image_path,), confidence=confidence).locate(region)
+    return found[1] if found else None
+
+def click_image(image_path: str, confidence: float = 0.8, region=None) -> bool:
+    location = _locate_image(image_path, confidence, region)
     if location:
         pyautogui.click(location)
         return True
     return False
 
-# 方法 1: 感知哈希 (pHash)
-def compare_phash(image_path1, image_path2):
-    pil_image1 = Image.open(image_path1)
-    pil_image2 = Image.open(image_path2)
+# 截一次屏匹配所有图片，点击第一个（按列表顺序）匹配上的，返回匹配上的图片路径
+def click_any_image(image_paths, confidence: float = 0.8, region=None):
+    found = get_matcher(tuple(image_paths), scales=(1.0, 0.75, 1.25), confidence=confidence).locate(region)
+    if found:
+        pyautogui.click(found[1])
+        return found[0]
+    return None
+
+# 在页面截图上匹配所有图片并用 page.mouse 点击，不依赖桌面截屏，无头模式和并行的多个页面都能用；
+# 传入clip_selector时只截这个元素（比如视频iframe），返回匹配上的图片路径
+def click_any_image_on_page(page, image_paths, confidence: float = 0.8, clip_selector=None):
+    matcher = get_matcher(tuple(image_paths), scales=(1.0, 0.75, 1.25), confidence=confidence)
+    origin = (0, 0)
+    if clip_selector:
+        element = page.locator(clip_selector).first
+        shot = element.screenshot(scale="css", animations="disabled", timeout=5e3)
+        box = element.bounding_box()  # 截图时元素已滚动到可见位置，这时的坐标就是点击坐标
+        if not box:
+            return None
+        origin = (box['x'], box['y'])
+    else:
+        shot = page.screenshot(scale="css", animations="disabled")
+    # 按CSS像素截图，截图坐标和页面坐标一一对应，不用再除以devicePixelRatio
+    found = matcher.locate_in_image(shot, origin=origin)
+    if found:
+        page.mouse.click(*found[1])
+        return found[0]
+    return None
+
+# 把页面元素的位置换算成屏幕区域 (left, top, width, height)，用来缩小截屏匹配的范围
+def screen_region(page, selector):
+    try:
+        box = page.locator(selector).first.bounding_box()
+        sx, sy, chrome_w, chrome_h, ratio = page.evaluate(
+            "[window.screenX, window.screenY, window.outerWidth - window.innerWidth, window.outerHeight - window.innerHeight, window.devicePixelRatio]")
+    except Exception:
+        return None
+    if not box:
+        return None
+    # 浏览器边框左右对称，工具栏都在上方
+    left = (sx + chrome_w / 2 + box['x']) * ratio
+    top = (sy + chrome_h - chrome_w / 2 + box['y']) * ratio
+    return (int(left), int(top), int(box['width'] * ratio), int(box['height'] * ratio))
+
+# 方法 1: 感知哈希 (pHash)，参数可以是图片路径，也可以是截图得到的bytes
+def compare_phash(image1, image2):
+    pil_image1 = Image.open(io.BytesIO(image1) if isinstance(image1, bytes) else image1)
+    pil_image2 = Image.open(io.BytesIO(image2) if isinstance(image2, bytes) else image2)
     hash1 = imagehash.phash(pil_image1)
     hash2 = imagehash.phash(pil_image2)
     similarity = 1 - (hash1 - hash2) / len(hash1.hash.flatten())
@@ -32,6 +87,7 @@ def convert_duration_to_seconds(duration):
     print(f"Hours: {hours}, Minutes: {minutes}, Seconds: {seconds}")
     return hours * 3600 + minutes * 60 + seconds
 
+@timed()
 def login(page, config, username, password):
     page.goto(config['login_url'], timeout=60*1000)
     page.fill(config['username_selector'], username)
@@ -41,20 +97,216 @@ def login(page, config, username, password):
     print("登陆成功.")
 
 # 转到课程学习页面
+@timed()
 def navigate_to_courses(page, config):
     page.click(f"text={config['course_button_text']}")
     page.wait_for_selector(config['card_item_selector'])  # 确认课程页面加载
     print("转到课程页面..")
 
-# 列出本页学习情况
-def list_courses(page, config, cur_page_num):
-    page.reload()
+# 按"data.list"这样的点分路径取JSON里的字段
+def _dig(data, path):
+    for key in path.split('.') if path else []:
+        if isinstance(data, list):
+            data = data[int(key)]
+        elif isinstance(data, dict):
+            data = data.get(key)
+        else:
+            return None
+    return data
+
+# 接口模式：监听课程列表和学习进度接口的响应，整理成 {标题: 课程} 的模型，代替逐个卡片读DOM
+class CourseFeed:
+    def __init__(self, config):
+        self.config = config
+        self.courses = {}  # title -> {'id', 'title', 'completed', 'page'}
+        self.page_titles = {}  # page_num -> [title, ...]
+        self.current_page = 1
+        self._responses = []
+
+    def attach(self, context):
+        """挂到BrowserContext上，新打开的视频页面的进度接口也能收到"""
+        context.on("response", self._on_response)
+
+    # 事件回调里只收集响应，解析放到drain里做，避免在回调中调用阻塞接口
+    def _on_response(self, response):
+        url = response.url
+        if self.config['catalog_api_pattern'] in url or self.config['progress_api_pattern'] in url:
+            self._responses.append(response)
+
+    def drain(self):
+        """解析收集到的响应，更新课程模型"""
+        responses, self._responses = self._responses, []
+        for response in responses:
+            try:
+                data = response.json()
+            except Exception as e:
+                print(f"--接口响应解析失败：{response.url}，错误信息：{e}")
+                continue
+            if self.config['catalog_api_pattern'] in response.url:
+                self._parse_catalog(data)
+            else:
+                self._parse_progress(data)
+
+    def _is_completed(self, item, field, values):
+        value = _dig(item, field)
+        return value in values if values else bool(value)
+
+    def _parse_catalog(self, data):
+        config = self.config
+        titles = []
+        for item in _dig(data, config['catalog_items_path']) or []:
+            title = _dig(item, config['catalog_title_field'])
+            self.courses[title] = {
+                'id': _dig(item, config['catalog_id_field']),
+                'title': title,
+                'completed': self._is_completed(item, config['catalog_completed_field'], config['catalog_completed_values']),
+                'page': self.current_page,
+            }
+            titles.append(title)
+        self.page_titles[self.current_page] = titles
+
+    def _parse_progress(self, data):
+        config = self.config
+        items = _dig(data, config['progress_items_path'])
+        for item in items if isinstance(items, list) else [items]:
+            if not isinstance(item, dict) or not self._is_completed(item, config['progress_completed_field'], config['progress_completed_values']):
+                continue
+            course_id = _dig(item, config['progress_id_field'])
+            for course in self.courses.values():
+                if course['id'] == course_id:
+                    course['completed'] = True
+
+    def is_completed(self, title):
+        self.drain()
+        course = self.courses.get(title)
+        return bool(course and course['completed'])
+
+    def unfinished(self, page_num):
+        self.drain()
+        return [t for t in self.page_titles.get(page_num, []) if not self.courses[t]['completed']]
+
+# 翻页器：记住当前页码，每次从当前页出发翻页；配置了页码选择器或页码URL时直接跳页
+class Pager:
+    def __init__(self, page, config, current=1, feed=None):
+        self.page = page
+        self.config = config
+        self.current = current
+        self.feed = feed
+
+    def _first_title(self):
+        first = self.page.query_selector(self.config['content_area_selector'])
+        return first.inner_text() if first else None
+
+    # 等待列表换页：第一张卡片的标题变化，再等异步加载的学习状态出现，代替networkidle加固定等待
+    def _wait_changed(self, old_title):
+        timeout = self.config.get('page_timeout', 10) * 1e3
+        try:
+            self.page.wait_for_function(
+                "([sel, old]) => { const e = document.querySelector(sel); return e && e.innerText !== old; }",
+                arg=[self.config['content_area_selector'], old_title], timeout=timeout)
+        except Exception:
+            return False
+        self.wait_ready()
+        return True
+
+    def wait_ready(self):
+        """等待异步加载的学习状态出现，已经出现时立即返回"""
+        if self.feed:
+            return  # 接口模式下状态来自接口响应，不需要等DOM
+        try:
+            self.page.wait_for_function(
+                "sel => [...document.querySelectorAll(sel)].some(e => e.textContent.trim())",
+                arg=self.config['status_selector'], timeout=self.config.get('status_timeout', 5) * 1e3)
+        except Exception:
+            self.page.wait_for_load_state("networkidle")  # 状态迟迟不出现时退回到原来的等法
+
+    def _jump(self, to_page_num):
+        if self.feed:
+            self.feed.current_page = to_page_num  # 接下来收到的列表响应属于目标页
+        if url_template := self.config.get('page_url_template'):
+            self.page.goto(url_template.format(page=to_page_num))
+            self.page.wait_for_selector(self.config['card_item_selector'])
+            self.wait_ready()
+            return True
+        if selector_template := self.config.get('page_number_selector'):
+            target = self.page.locator(selector_template.format(page=to_page_num))
+            if target.count():
+                old_title = self._first_title()
+                target.first.click()
+                return self._wait_changed(old_title)
+        return False
+
+    def _step(self, text):
+        if self.feed:
+            self.feed.current_page = self.current + (1 if text == self.config['next_page_text'] else -1)
+        old_title = self._first_title()
+        try:
+            self.page.click(f"text={text}", timeout=self.config.get('page_timeout', 10) * 1e3)
+        except Exception:
+            return False  # 没有这个按钮，比如最后一页没有“下一页”
+        return self._wait_changed(old_title)
+
+    @timed("page_switch")
+    def goto(self, to_page_num):
+        """翻到指定页，成功返回True；翻不动（比如已经是最后一页）返回False"""
+        if to_page_num == self.current:
+            return True
+        if self._jump(to_page_num):
+            self.current = to_page_num
+            return True
+        text = self.config['next_page_text'] if to_page_num > self.current else self.config['prev_page_text']
+        step = 1 if to_page_num > self.current else -1
+        while self.current != to_page_num:
+            if not self._step(text):
+                print(f"-翻页失败，停在第{self.current}页")
+                return False
+            self.current += step
+        return True
+
+    def _page_from_url(self):
+        """当前URL里的页码参数（page_query_param），没有时返回None"""
+        param = self.config.get('page_query_param')
+        values = parse_qs(urlparse(self.page.url).query).get(param) if param else None
+        try:
+            return int(values[0]) if values else None
+        except ValueError:
+            return None
+
+    def refresh(self):
+        """只刷新列表数据：翻到相邻页再翻回来，翻不动时才整页刷新"""
+        cur_page_num = self.current
+        neighbour = cur_page_num - 1 if cur_page_num > 1 else cur_page_num + 1
+        if self.goto(neighbour) and self.goto(cur_page_num):
+            return
+        if self.config.get('page_url_template') and self._jump(cur_page_num):
+            self.current = cur_page_num  # 按页码URL重新打开，本身就是整页刷新
+            return
+        # 页码留在URL里的站点刷新后还停在原来那页，否则回到第1页
+        landing = self._page_from_url() or 1
+        if self.feed:
+            self.feed.current_page = landing
+        self.page.reload()
+        self.page.wait_for_selector(self.config['card_item_selector'])
+        self.current = landing
+        self.goto(cur_page_num)
+        self.wait_ready()
+
+# 列出本页学习情况，给了store时同步记录课程状态，并跳过本地已记录完成的课程
+@timed()
+def list_courses(pager, config, cur_page_num, store=None, refresh=False):
     # page.click(f"text=最新")
     # print("按最新排序...")
     # page.wait_for_timeout(1e3) 
-    switch_to_page_num(page, config, cur_page_num)
+    if refresh and pager.current == cur_page_num:
+        pager.refresh()
+    else:
+        pager.goto(cur_page_num)
+        pager.wait_ready()
 
-    course_elements = page.query_selector_all(config['card_item_selector'])
+    if pager.feed:
+        return list_courses_from_feed(pager.feed, config, cur_page_num, store)
+
+    course_elements = pager.page.query_selector_all(config['card_item_selector'])
     unfinished_courses = []
     
     for course in course_elements:
@@ -62,6 +314,9 @@ def list_courses(page, config, cur_page_num):
         status_elements = course.query_selector_all(config['status_selector'])
         
         is_completed = any("已完成" in status.text_content() for status in status_elements)
+        if store:
+            store.mark_seen(title, cur_page_num, is_completed)
+            is_completed = is_completed or store.is_done(title, config.get('recheck_done_hours'))  # 页面显示已完成时以页面为准
         if not is_completed:
             unfinished_courses.append(title)
     
@@ -71,40 +326,122 @@ def list_courses(page, config, cur_page_num):
     print("-Skip Courses:", config['skip_courses'])
     return list(filter(lambda c: c not in config['skip_courses'], unfinished_courses))
 
+# 接口模式下列出本页学习情况，不再逐个卡片读DOM
+def list_courses_from_feed(feed, config, cur_page_num, store=None):
+    feed.drain()
+    titles = feed.page_titles.get(cur_page_num, [])
+    unfinished_courses = []
+    for title in titles:
+        is_completed = feed.courses[title]['completed']
+        if store:
+            store.mark_seen(title, cur_page_num, is_completed)
+            is_completed = is_completed or store.is_done(title, config.get('recheck_done_hours'))  # 页面显示已完成时以页面为准
+        if not is_completed:
+            unfinished_courses.append(title)
+
+    # 接口里的标题不带学分学时那几行，按第一段比较
+    skip_names = [c.split()[0] for c in config['skip_courses']]
+    print("-总课程数量:", len(titles))
+    print("-未学习课程数量:", len(unfinished_courses))
+    print("-未学习课程清单:", unfinished_courses)
+    return [c for c in unfinished_courses if c.split()[0] not in skip_names]
+
 def switch_to_page_num(page, config, to_page_num, from_page_num=1):
-    click_times = to_page_num - from_page_num
-    for _ in range(click_times):
-        page.click(f"text={config['next_page_text']}")
-        page.wait_for_selector(config['card_item_selector'])  # 等待新页面加载
-        if _ == click_times-1:
-            page.wait_for_timeout(1e3)
-            page.wait_for_load_state("networkidle") #'是否完成'等状态是异步加载的，只有上一句可能没有加载出数据，只加载了网页框架。
+    return Pager(page, config, from_page_num).goto(to_page_num)
             
-def try_click(click_fn, *args):
+# 给了熔断器时，连续失败的定位器在冷却期内直接跳过，不再每门课都等它超时
+def try_click(click_fn, *args, breaker=None):
     try:
-        click_fn(*args)
+        if breaker:
+            breaker.call(click_fn, *args)
+        else:
+            click_fn(*args)
         return True
+    except CircuitOpenError:
+        return False
     except Exception as e:
         print(f"{click_fn.__name__}点击失败: {args}")
         return False
 
-def try_play(page, play_btn_paths, play_element_locators, is_headless):
-    if not is_headless:
-        # 有头，优先尝试图像定位播放
-        for image_path in play_btn_paths:
-            if try_click(click_image, image_path):
-                print(f"---图像定位播放：{image_path}---")
-                return True
+# image_locator: "page" 在页面截图上找播放按钮（无头也能用），"screen" 用桌面截屏（仅有头），None 不用图像定位
+def try_play(target, video_page, play_btn_paths, play_element_locators, image_locator="page", clip_selector=None):
+    if image_locator:
+        # 优先尝试图像定位播放，一次截图匹配所有按钮图片
+        try:
+            if image_locator == "screen":
+                region = screen_region(video_page, clip_selector) if clip_selector else None
+                image_path = click_any_image(play_btn_paths, region=region)
+            else:
+                image_path = click_any_image_on_page(video_page, play_btn_paths, clip_selector=clip_selector)
+        except Exception as e:
+            image_path = None
+            print(f"图像定位点击失败: {e}")
+        if image_path:
+            print(f"---图像定位播放：{image_path}---")
+            return True
     # 尝试元素定位播放
     for loc in play_element_locators:
-        if try_click(page.locator(loc).click):
+        if try_click(target.locator(loc).click, breaker=get_breaker(f"play:{loc}")):
             print("---元素定位播放---")
             return True
     print(f"-模拟播放失败,可能自动播放了..")  # 可能是自动播放了 
     return False
 
-# 学习一个视频
-def play_video(page, course_title, config, is_headless):
+# 注入到<video>上的脚本：第一次调用时挂上ended事件监听，之后每次返回当前播放状态
+VIDEO_WATCH_JS = """v => {
+    if (!v.__watch) {
+        v.__watch = {ended: v.ended};
+        v.addEventListener('ended', () => { v.__watch.ended = true; });
+    }
+    return {currentTime: v.currentTime, duration: v.duration, paused: v.paused, ended: v.__watch.ended || v.ended};
+}"""
+
+# 等待ended事件，超时返回false
+VIDEO_END_JS = """(v, timeoutMs) => new Promise(resolve => {
+    if (v.ended) return resolve(true);
+    const timer = setTimeout(() => resolve(false), timeoutMs);
+    v.addEventListener('ended', () => { clearTimeout(timer); resolve(true); }, {once: true});
+})"""
+
+# 读取视频元素的播放状态，没有视频元素时返回None
+def probe_video(target):
+    try:
+        return target.locator('video').first.evaluate(VIDEO_WATCH_JS, timeout=2e3)
+    except Exception:
+        return None
+
+# 阻塞等待视频播放结束，ended事件触发即返回
+def wait_for_video_end(target, timeout_seconds):
+    try:
+        return target.locator('video').first.evaluate(VIDEO_END_JS, max(0, timeout_seconds) * 1e3)
+    except Exception as e:
+        print(f"--等待视频结束失败：{e}")
+        return False
+
+# 估算剩余播放秒数：优先用视频元素的状态，其次读播放器上的时间文本
+def remaining_seconds(target, video_state, config):
+    if video_state and 0 < video_state['duration'] < float('inf'):
+        return video_state['duration'] - video_state['currentTime']
+    try:
+        duration = target.locator('.vjs-duration-display').inner_text().split()[-1]
+        played_duration = target.locator('.vjs-current-time-display').inner_text().split()[-1]
+        return convert_duration_to_seconds(duration) - convert_duration_to_seconds(played_duration)
+    except:
+        print("--Got duration failed, wait 30 mins..")
+        return config.get('max_video_seconds', 30*60)
+
+# 每门课的计时记在以课程名命名的行上：course 包含 open_video、play_detection、wait 三段
+def _trace_course_end(session, result):
+    tracer = get_tracer()
+    if 'wait_start' in session:
+        tracer.record("wait", session['wait_start'], track=session['track'])
+    tracer.record("course", session['opened_at'], track=session['track'], result=result)
+
+# 打开视频页面并开始播放，返回播放会话；打开失败或已完成时返回None
+def start_video(page, course_title, config, is_headless):
+    tracer = get_tracer()
+    track = course_title.split()[0]
+    opened_at = tracer.now()
     with page.context.expect_page() as newpage:
         try:
             page.click(f"text={course_title}")
@@ -112,99 +449,359 @@ def play_video(page, course_title, config, is_headless):
             video_page.wait_for_load_state("networkidle")
         except Exception as e:
             print(f"-视频页面打开失败，暂时跳过“{course_title.split()[0]}”。错误信息：{e}")
-            return
+            tracer.record("open_video", opened_at, track=track, error=type(e).__name__)
+            return None
+    tracer.record("open_video", opened_at, track=track)
+
+    # iframe检测
+    iframe = None
+    if video_page.query_selector("iframe"):
+        iframe = video_page.frame_locator("iframe")
+    else:
+        print(f"-未检测到iframe，直接在页面上定位")
+
+    # 有iframe时，视频下面会有一个状态元素
+    if iframe:
+        try:
+            status = iframe.locator(".progress-view-status").inner_text()
+            if "已完成" in status:
+                print(f"---课程“{course_title}”状态显示已完成，跳过学习---")
+                video_page.close()
+                tracer.record("course", opened_at, track=track, result="already_done")
+                return None
+        except Exception as e:
+            print(f"--未找到学习状态，继续学习视频。错误信息：{e}")
+
+    target = iframe if iframe else video_page
+    video_state = probe_video(target)
+
+    play_btn_paths = ['play.png', 'play1.png', 'play2.png']
+    play_element_locators = ['.vjs-big-play-button', '#D209registerMask']
+    # 只在视频区域里找播放按钮；无头时没有桌面可截，桌面截屏改用页面截图
+    detect_start = tracer.now()
+    image_locator = config.get('image_locator', "page")
+    if is_headless and image_locator == "screen":
+        image_locator = "page"
+    try_play(target, video_page, play_btn_paths, play_element_locators, image_locator, "iframe" if iframe else "video")
+    # 点击播放之后再截图作为基准（去掉了播放按钮遮罩），只在视频元素不可用时用来做像素比对
+    first_shot = video_page.screenshot()
 
-        # iframe检测
-        iframe = None
-        if video_page.query_selector("iframe"):
-            iframe = video_page.frame_locator("iframe")
+    print(f"-开始学习：“{course_title.split()[0]}”")
+    now = time.monotonic()
+    return {
+        'title': course_title,
+        'page': video_page,
+        'target': target,
+        'config': config,
+        'first_shot': first_shot,
+        'start_time': video_state['currentTime'] if video_state else 0,
+        'has_video': video_state is not None,
+        'state': 'verifying',
+        'verify_until': now + config.get('verify_seconds', 15),
+        'due': now + 1,
+        'track': track,
+        'opened_at': opened_at,
+        'detect_start': detect_start,
+    }
+
+# 推进一个播放会话的状态，视频结束（或失败）并关闭页面时返回True
+def step_video(session, feed=None):
+    now = time.monotonic()
+    if feed and feed.is_completed(session['title']):
+        # 接口模式下服务器一记录完成就结束，不用等视频放完
+        print(f"---接口显示已完成：“{session['title'].split()[0]}”---")
+        session['played'] = True
+        session['result'] = "api_completed"
+        session['page'].close()
+        _trace_course_end(session, "api_completed")
+        return True
+    if now < session['due']:
+        return False
+    video_page, target, config = session['page'], session['target'], session['config']
+    poll_seconds = config.get('poll_seconds', 5)
+    # 确认播放期间视频元素可能晚加载出来，每次都重新探测
+    video_state = probe_video(target) if session['has_video'] or session['state'] == 'verifying' else None
+    session['has_video'] = session['has_video'] or video_state is not None
+
+    if session['state'] == 'verifying':
+        advanced = video_state and (video_state['ended'] or (not video_state['paused'] and video_state['currentTime'] > session['start_time']))
+        if not advanced:
+            # 没有视频元素或探测失败时也要等满verify_seconds，播放刚开始时前后两帧几乎一样
+            if now < session['verify_until']:
+                session['due'] = now + 1
+                return False
+            # 视频元素不可用或进度一直没动，退回到截图比对
+            similarity = compare_phash(session['first_shot'], video_page.screenshot())
+            if similarity >= 0.95:
+                print(f"--画面相似度{similarity}，播放失败！“{session['title'].split()[0]}”")
+                video_page.close()
+                get_tracer().record("play_detection", session['detect_start'], track=session['track'], result="failed")
+                _trace_course_end(session, "play_failed")
+                return True
+            print(f"--画面相似度{similarity}，播放中...")
         else:
-            print(f"-未检测到iframe，直接在页面上定位")
-        
-        # 有iframe时，视频下面会有一个状态元素
-        if iframe:
-            try:
-                status = iframe.locator(".progress-view-status").inner_text()
-                if "已完成" in status:
-                    print(f"---课程“{course_title}”状态显示已完成，跳过学习---")
-                    video_page.close()
-                    return
-            except Exception as e:
-                print(f"--未找到学习状态，继续学习视频。错误信息：{e}")
-
-        play_btn_paths = ['play.png', 'play1.png', 'play2.png']
-        play_element_locators = ['.vjs-big-play-button', '#D209registerMask']
-        try_play(iframe if iframe else video_page, play_btn_paths, play_element_locators, is_headless)
-
-        video_page.screenshot(path="after_play.png")
-        print(f"-开始学习：“{course_title.split()[0]}”")
-        video_page.wait_for_timeout(15e3) # 防止意外，稍微加固
-        video_page.screenshot(path="after_play_15s.png")
-        similarity = compare_phash("after_play.png", "after_play_5s.png")
-        if similarity < 0.95:
-            print(f"--15s相似度{similarity}，播放中...")
-            try:
-                duration = iframe.locator('.vjs-duration-display').inner_text().split()[-1] if iframe else video_page.locator('.vjs-duration-display').inner_text().split()[-1]
-                played_duration = iframe.locator('.vjs-current-time-display').inner_text().split()[-1] if iframe else video_page.locator('.vjs-current-time-display').inner_text().split()[-1] 
-                left_seconds = convert_duration_to_seconds(duration) - convert_duration_to_seconds(played_duration)
-                print(f"--left seconds： {left_seconds}")
-                video_page.wait_for_timeout(left_seconds*1e3)  # 等待视频播放完毕
-            except:
-                print("--Got duration failed, wait 30 mins..")
-                video_page.wait_for_timeout(30*60e3)
-            print("---学习结束---")
+            print(f"--播放中，当前进度{video_state['currentTime']:.0f}s...")
+
+        get_tracer().record("play_detection", session['detect_start'], track=session['track'],
+                            method="video" if advanced else "phash")
+        session['wait_start'] = get_tracer().now()
+        left_seconds = remaining_seconds(target, video_state, config)
+        print(f"--left seconds： {left_seconds}")
+        session['state'] = 'playing'
+        # ended事件是结束的主要依据，deadline只是兜底
+        session['deadline'] = now + left_seconds + (poll_seconds if session['has_video'] else 0)
+        session['due'] = now + (min(left_seconds, poll_seconds) if session['has_video'] else left_seconds)
+        return False
+
+    ended = bool(video_state and video_state['ended'])
+    if now < session['deadline'] and not ended:
+        session['due'] = now + min(max(session['deadline'] - now, 1), poll_seconds)
+        return False
+
+    if video_state and 0 < video_state['duration'] < float('inf'):
+        session['duration'] = video_state['duration']
+    video_page.close()  # 关闭视频页面
+    if ended:
+        print(f"---学习结束：“{session['title'].split()[0]}”---")
+        session['played'] = True
+        session['result'] = "played"
+    else:
+        # 只是到了时间，没看到ended事件，不算完成，留给下次列表页按页面状态重新检查
+        print(f"---学习超时，未确认播放完成：“{session['title'].split()[0]}”---")
+        session['result'] = "timeout"
+    _trace_course_end(session, session['result'])
+    return True
+
+# 学习一个视频，播放完成返回True
+def play_video(page, course_title, config, is_headless):
+    session = start_video(page, course_title, config, is_headless)
+    if not session:
+        return False
+    while not step_video(session):
+        if session['state'] == 'playing' and session['has_video']:
+            wait_for_video_end(session['target'], session['deadline'] - time.monotonic())
+            session['due'] = time.monotonic()
         else:
-            print(f"--15s相似度{similarity}，播放失败！")
-            
-        video_page.close()  # 关闭视频页面
+            session['page'].wait_for_timeout(max(0, session['due'] - time.monotonic()) * 1e3)
+    return session.get('played', False)
+
+# 同时学习多个视频：最多保持max_parallel_videos个视频页面，有视频结束就补上下一个
+def play_videos_concurrently(page, course_titles, config, is_headless, store=None, feed=None):
+    max_parallel = max(1, config.get('max_parallel_videos', 1))
+    pending = list(course_titles)
+    active = {}  # slot -> session
+    while pending or active:
+        for slot in range(max_parallel):
+            if pending and slot not in active:
+                session = start_video(page, pending.pop(0), config, is_headless)
+                if session:
+                    active[slot] = session
+        if not active:
+            continue
+
+        # 在主页面上等待，直到最早的一个会话需要处理
+        next_due = min(session['due'] for session in active.values())
+        page.wait_for_timeout(max(0, next_due - time.monotonic()) * 1e3)
+        for slot, session in list(active.items()):
+            if step_video(session, feed):
+                del active[slot]
+                if store and session.get('played'):
+                    store.mark_done(session['title'], session.get('duration'))
+    print(f"-本页{len(course_titles)}个视频处理完毕")
+
+# 精简模式下注入每个页面和iframe：视频静音，video.js播放器只保留最低清晰度
+LEAN_VIDEO_JS = """
+document.addEventListener('play', e => { e.target.muted = true; }, true);
+document.addEventListener('loadedmetadata', e => {
+    e.target.muted = true;
+    const players = window.videojs && window.videojs.getPlayers ? Object.values(window.videojs.getPlayers()) : [];
+    for (const player of players) {
+        if (!player || !player.qualityLevels) continue;
+        const levels = player.qualityLevels();
+        let lowest = 0;
+        for (let i = 0; i < levels.length; i++) {
+            if ((levels[i].height || 0) < (levels[lowest].height || 0)) lowest = i;
+        }
+        for (let i = 0; i < levels.length; i++) levels[i].enabled = i === lowest;
+    }
+}, true);
+"""
+
+# firefox层面的精简设置：不加载图片、静音、允许自动播放
+LEAN_FIREFOX_PREFS = {
+    'permissions.default.image': 2,
+    'media.volume_scale': "0.0",
+    'media.autoplay.default': 0,
+}
+
+# 开着图像定位（image_locator）时不能禁用图片，否则图片画的播放按钮根本不会显示，模板永远匹配不上
+def lean_firefox_prefs(config):
+    if config.get('image_locator'):
+        return {k: v for k, v in LEAN_FIREFOX_PREFS.items() if k != 'permissions.default.image'}
+    return LEAN_FIREFOX_PREFS
+
+def lean_blocked_types(config):
+    blocked_types = set(config['block_resource_types'])
+    if config.get('image_locator'):
+        blocked_types.discard('image')
+    return blocked_types
+
+# 精简模式：按资源类型和域名拦截请求，并统计流量
+def apply_lean_profile(context, config, stats):
+    blocked_types = lean_blocked_types(config)
+    blocked_hosts = tuple(config['block_hosts'])
+
+    def handle(route):
+        request = route.request
+        host = urlparse(request.url).hostname or ""
+        if request.resource_type in blocked_types or host.endswith(blocked_hosts):
+            stats['blocked'] += 1
+            route.abort()
+        else:
+            route.continue_()
 
-# main loop，翻页和学习
-def study_courses(page, config, is_headless):
-    cur_page_num = 1
+    context.route("**/*", handle)
+    context.add_init_script(LEAN_VIDEO_JS)
+
+# 统计每次运行的请求数和传输字节数（按响应头content-length估算）
+def track_traffic(context, stats):
+    def on_response(response):
+        stats['requests'] += 1
+        stats['bytes'] += int(response.headers.get('content-length') or 0)
+    context.on("response", on_response)
+
+def report_run_stats(stats, start_wall, start_cpu):
+    """打印本次运行的流量和CPU时间；浏览器进程的CPU时间在浏览器退出后才能统计到"""
+    cpu = {'python': time.process_time() - start_cpu}
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu['browser'] = usage.ru_utime + usage.ru_stime
+    except ImportError:
+        pass  # Windows 没有 resource 模块
+    print(f"-运行统计：耗时{time.monotonic() - start_wall:.0f}s，请求{stats['requests']}个，"
+          f"拦截{stats['blocked']}个，传输约{stats['bytes'] / 2**20:.1f}MB，"
+          + "，".join(f"{k} CPU {v:.1f}s" for k, v in cpu.items()))
+
+# main loop，翻页和学习；翻到最后一页时，本地记录里没有未完成的课程才返回True
+def study_courses(page, config, is_headless, store=None, feed=None):
+    # 有本地缓存时，直接从第一个还有未完成课程的页开始
+    cur_page_num = store.first_pending_page(skip=config['skip_courses']) if store else 1
+    if cur_page_num > 1:
+        print(f"-根据本地记录，从第{cur_page_num}页开始")
+    pager = Pager(page, config, feed=feed)
     page_try_times = {}
     while True:
-        if (times:=page_try_times.get(cur_page_num, 0)) < 2 and (unfinished_courses:=list_courses(page, config, cur_page_num)):
+        times = page_try_times.get(cur_page_num, 0)
+        if times < 2 and (unfinished_courses:=list_courses(pager, config, cur_page_num, store, refresh=times > 0)):
             page_try_times[cur_page_num] = times + 1
             
             if unfinished_courses:
-                for course_title in unfinished_courses:
-                    play_video(page, course_title, config, is_headless)
+                play_videos_concurrently(page, unfinished_courses, config, is_headless, store, feed)
         else:
-           switch_to_page_num(page, config, to_page_num=cur_page_num+1, from_page_num=cur_page_num)
-           cur_page_num += 1
+            if not pager.goto(cur_page_num+1):
+                # 播放失败或重试后还没完成的课程留给下次运行，这时不能算学完
+                pending = store.pending(skip=config['skip_courses'] + [c.split()[0] for c in config['skip_courses']]) if store else []
+                if pending:
+                    print(f"-已到最后一页（第{cur_page_num}页），还有{len(pending)}门课程未完成：{pending}")
+                    return False
+                print(f"-已到最后一页（第{cur_page_num}页），学习结束")
+                return store is not None
+            cur_page_num += 1
 
-def main():
-    config = {
-        'login_url': "https",
-        'username_selector': '#D65username',
-        'password_selector': '#D65pword',
-        'login_button_selector': '#D65login',
-        'login_success_selector': '.app-header-logo',
-        'next_page_text': "下一页",
-        'course_button_text': "课程",
-        'card_item_selector': ".card-item",
-        'content_area_selector': ".content-area",
-        'status_selector': ".status",
-        'duration_display_selector': "span.vjs-duration-display", # 没采用
-        'play_button_selector': "#D209registerMask",  # 没采用
-        'iframe_selector': "iframe",  # 没采用
-        'skip_courses': ['领导性格分析与胜任力提升（一）\n学分: - 学时: - 共2节', '领导性格分析与胜任力提升（二）\n学分: - 学时: - 共2节'],
-        # 'mute_button_selector': "button[aria-label='Mute']",
-    }
-    username = ""
-    password = ""
-    is_headless = False
+CONFIG = {
+    'login_url': "https",
+    'username_selector': '#D65username',
+    'password_selector': '#D65pword',
+    'login_button_selector': '#D65login',
+    'login_success_selector': '.app-header-logo',
+    'next_page_text': "下一页",
+    'prev_page_text': "上一页",
+    'page_number_selector': None,  # 分页条上页码按钮的选择器模板，如 ".pagination li:text-is('{page}')"，配置后直接跳页
+    'page_url_template': None,  # 列表页支持页码参数时的URL模板，如 "https://.../courses?page={page}"
+    'page_query_param': "page",  # 列表页URL里的页码参数名，整页刷新后据此判断停在哪页；URL里没有时按第1页算
+    'course_button_text': "课程",
+    'card_item_selector': ".card-item",
+    'content_area_selector': ".content-area",
+    'status_selector': ".status",
+    'duration_display_selector': "span.vjs-duration-display", # 没采用
+    'play_button_selector': "#D209registerMask",  # 没采用
+    'iframe_selector': "iframe",  # 没采用
+    'max_parallel_videos': 3,  # 同时播放的视频页面数，1为逐个学习
+    'image_locator': "page",  # 播放按钮图像定位："page" 页面截图（无头可用），"screen" 桌面截屏，None 不用；不为None时精简模式不拦截图片
+    'verify_seconds': 15,  # 播放进度多久不动就判定为播放失败
+    'poll_seconds': 5,  # 同时播放时检查视频是否结束的间隔
+    'max_video_seconds': 30*60,  # 拿不到时长时的兜底等待
+    'state_file': "course_state.jsonl",  # 本地课程状态缓存，重新运行时跳过已完成的页和课程
+    'recheck_done_hours': None,  # 本地完成记录超过多少小时后重新以网页状态为准，None为一直信任
+    # 接口模式：从课程列表/学习进度接口的JSON里读状态，字段路径按实际接口填写
+    'api_mode': False,
+    'catalog_api_pattern': "/course/list",  # 列表接口URL中包含的片段
+    'catalog_items_path': "data.list",
+    'catalog_id_field': "id",
+    'catalog_title_field': "name",
+    'catalog_completed_field': "studyStatus",
+    'catalog_completed_values': ["已完成", 2],  # 为空时按字段真假判断
+    'progress_api_pattern': "/study/progress",
+    'progress_items_path': "data",
+    'progress_id_field': "courseId",
+    'progress_completed_field': "finished",
+    'progress_completed_values': [],
+    # 精简模式：无头、去掉slow_mo、拦截图片（不用图像定位时）、字体和统计广告、视频静音并用最低清晰度
+    'lean_profile': True,
+    'headless': None,  # None时跟随lean_profile
+    'trace_dir': None,  # 运行结束时把各环节的计时写到这个目录：<用户名>.trace.jsonl 和 Chrome trace 格式的 <用户名>.trace.json
+    'block_resource_types': ['image', 'font'],  # 'image' 只在 image_locator 为None时生效
+    'block_hosts': ['google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'hm.baidu.com', 'cnzz.com', 'growingio.com'],
+    'skip_courses': ['领导性格分析与胜任力提升（一）\n学分: - 学时: - 共2节', '领导性格分析与胜任力提升（二）\n学分: - 学时: - 共2节'],
+    # 'mute_button_selector': "button[aria-label='Mute']",
+}
+
+# 学习一个账号的全部课程，全部学完返回True
+def run_account(username, password, config):
+    lean = config['lean_profile']
+    is_headless = lean if config['headless'] is None else config['headless']
+    store = CourseStore(config['state_file'])
+    stats = {'requests': 0, 'blocked': 0, 'bytes': 0}
+    start_wall, start_cpu = time.monotonic(), time.process_time()
+    trace_base = None
+    if config.get('trace_dir'):
+        os.makedirs(config['trace_dir'], exist_ok=True)
+        trace_base = os.path.join(config['trace_dir'], username or "default")
+    tracer = reset_tracer(trace_base + ".trace.jsonl" if trace_base else None)  # 边运行边追加，中断也不丢
     
-    with sync_playwright() as p:
-        browser = p.firefox.launch(headless=is_headless, slow_mo=50)
-        # browser = p.chromium.connect_over_cdp('http://127.0.0.1:12345')   #指定本地浏览器启动
-        page = browser.new_page()
+    try:
+        with playwright_api.sync_playwright() as p:
+            if lean:
+                browser = p.firefox.launch(headless=is_headless, firefox_user_prefs=lean_firefox_prefs(config))
+            else:
+                browser = p.firefox.launch(headless=is_headless, slow_mo=50)
+            # browser = p.chromium.connect_over_cdp('http://127.0.0.1:12345')   #指定本地浏览器启动
+            page = browser.new_page()
+            track_traffic(page.context, stats)
+            if lean:
+                apply_lean_profile(page.context, config, stats)
+            feed = None
+            if config['api_mode']:
+                feed = CourseFeed(config)
+                feed.attach(page.context)
         
-        login(page, config, username, password)
-        navigate_to_courses(page, config)
-        study_courses(page, config, is_headless)
+            login(page, config, username, password)
+            navigate_to_courses(page, config)
+            finished = study_courses(page, config, is_headless, store, feed)
         
-        browser.close()
+            browser.close()
+            return finished
+    finally:
+        report_run_stats(stats, start_wall, start_cpu)  # Ctrl+C 中断时也打印
+        tracer.report()
+        if trace_base:
+            tracer.export_chrome_trace(trace_base + ".trace.json")
+
+def main():
+    username = ""
+    password = ""
+    run_account(username, password, CONFIG)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,127 @@
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+MAIN_SENS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main-sens.py")
+
+def load_main_sens():
+    """main-sens.py 文件名带横线，不能直接 import，按路径加载"""
+    spec = importlib.util.spec_from_file_location("main_sens", MAIN_SENS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_account_job(account, state_dir):
+    """
+    在独立的工作进程中学习一个账号。课程进度记录在 state_dir/<用户名>.jsonl，
+    进程崩溃或重启后从记录处继续。返回是否全部学完。
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 由调度进程统一处理 Ctrl+C
+    main_sens = load_main_sens()
+    config = {**main_sens.CONFIG, **account.get('config', {})}
+    config['state_file'] = os.path.join(state_dir, f"{account['username']}.jsonl")
+    return bool(main_sens.run_account(account['username'], account['password'], config))
+
+class Scheduler:
+    """
+    多账号调度：每个账号一个工作进程（各自的浏览器），同时运行的浏览器不超过 max_browsers 个；
+    账号级的完成情况写入 state_dir/scheduler.json，重新运行时跳过已完成的账号。
+
+    参数:
+    - accounts: [{'username', 'password', 'config': {覆盖 main-sens CONFIG 的键}}, ...]
+    - max_browsers: 本机同时运行的浏览器（工作进程）数上限。
+    - retries: 每次运行中账号失败（异常退出或没学完）后重试的次数，重试从进度记录处继续。
+    """
+    def __init__(self, accounts, state_dir="state", max_browsers=2, retries=2):
+        self.accounts = accounts
+        self.state_dir = state_dir
+        self.max_browsers = max_browsers
+        self.retries = retries
+        self.checkpoint_path = os.path.join(state_dir, "scheduler.json")
+        os.makedirs(state_dir, exist_ok=True)
+        self.state = {}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        self._stopping = False
+
+    def _save(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _record(self, username, **fields):
+        self.state.setdefault(username, {'done': False, 'attempts': 0}).update(fields, updated_at=time.time())
+        self._save()
+
+    def _stop(self, signum, frame):
+        print("收到退出信号，等待正在运行的账号结束后退出（再按一次强制退出）...")
+        self._stopping = True
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    def run(self):
+        """运行到所有账号学完（或重试用尽），返回 {用户名: 是否学完}"""
+        pending = [a for a in self.accounts if not self.state.get(a['username'], {}).get('done')]
+        print(f"共{len(self.accounts)}个账号，待学习{len(pending)}个，最多同时运行{self.max_browsers}个浏览器")
+        signal.signal(signal.SIGINT, self._stop)
+        if hasattr(signal, "SIGTERM"):
+            signal.signal(signal.SIGTERM, self._stop)
+
+        # 每个账号一个单独的新进程（单进程的进程池）：浏览器和内存随进程一起释放，
+        # 某个账号的浏览器把进程搞崩也只影响这一个账号
+        running = {}
+        tries = {}  # 本次运行里每个账号的尝试次数；scheduler.json 里的 attempts 是历次运行的累计，不用来判断重试
+        try:
+            while (pending and not self._stopping) or running:
+                while pending and not self._stopping and len(running) < self.max_browsers:
+                    account = pending.pop(0)
+                    attempts = self.state.get(account['username'], {}).get('attempts', 0) + 1
+                    tries[account['username']] = tries.get(account['username'], 0) + 1
+                    self._record(account['username'], attempts=attempts)
+                    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+                    running[executor.submit(run_account_job, account, self.state_dir)] = (account, executor)
+                    print(f"-开始账号 {account['username']}（第{attempts}次）")
+
+                finished, _ = wait(running, timeout=5, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    account, executor = running.pop(future)
+                    executor.shutdown(wait=False)
+                    username = account['username']
+                    try:
+                        done, error = future.result(), None
+                    except Exception as e:
+                        done, error = False, repr(e)
+                    self._record(username, done=done, error=error)
+                    if done:
+                        print(f"-账号 {username} 全部学完")
+                    elif tries[username] <= self.retries:
+                        print(f"-账号 {username} 未学完，稍后从进度记录处重试。错误信息：{error}")
+                        pending.append(account)
+                    else:
+                        print(f"-账号 {username} 重试次数用尽。错误信息：{error}")
+        finally:
+            for account, executor in running.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+        return {a['username']: self.state.get(a['username'], {}).get('done', False) for a in self.accounts}
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号并行学习，支持断点续学")
+    parser.add_argument("accounts", help="账号列表JSON文件：[{\"username\", \"password\", \"config\": {...}}, ...]")
+    parser.add_argument("--state-dir", default="state", help="进度记录目录")
+    parser.add_argument("--max-browsers", type=int, default=2, help="本机同时运行的浏览器数上限")
+    parser.add_argument("--retries", type=int, default=2, help="账号失败后的重试次数")
+    args = parser.parse_args()
+
+    with open(args.accounts, encoding="utf-8") as f:
+        accounts = json.load(f)
+    results = Scheduler(accounts, args.state_dir, args.max_browsers, args.retries).run()
+    print(f"完成 {sum(results.values())}/{len(results)} 个账号")
+
+if __name__ == "__main__":
+    main()
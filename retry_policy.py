@@ -0,0 +1,166 @@
+import functools
+import importlib
+import inspect
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, Type, Union
+
+# ========== 重试策略 ==========
+class RetryError(RuntimeError):
+    """重试次数或时间用尽，原始异常保存在 last_exception 中（同时作为 __cause__）"""
+    def __init__(self, message: str, last_exception: Optional[BaseException] = None):
+        super().__init__(message)
+        self.last_exception = last_exception
+
+@dataclass
+class RetryPolicy:
+    """
+    指数退避加随机抖动的重试策略。
+
+    - max_attempts: 最多尝试次数（包括第一次）。
+    - base_delay / max_delay: 第一次重试前的等待和等待上限（秒），每次乘以 multiplier。
+    - jitter: 随机抖动比例，1.0 表示在 [0, delay] 中随机取值（full jitter）。
+    - retry_on: 只有这些异常类型才重试，其它异常直接抛出；也可以写成 "模块.类名" 字符串，
+      第一次出错时才导入，避免为了声明重试条件在启动时导入 selenium 之类的库。
+    - deadline: 整个操作（含等待）的总时限（秒），None 表示不限。
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.005
+    max_delay: float = 1.0
+    multiplier: float = 2.0
+    jitter: float = 1.0
+    retry_on: Tuple[Union[Type[BaseException], str], ...] = (Exception,)
+    deadline: Optional[float] = None
+
+    def exceptions(self) -> Tuple[Type[BaseException], ...]:
+        """把 retry_on 中的字符串解析成异常类（只解析一次）"""
+        resolved = self.__dict__.get('_resolved')
+        if resolved is None:
+            resolved = tuple(_resolve(e) if isinstance(e, str) else e for e in self.retry_on)
+            self.__dict__['_resolved'] = resolved
+        return resolved
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次失败后（从1开始）应该等待的秒数"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    def next_delay(self, attempt: int, started: float) -> Optional[float]:
+        """还能重试时返回等待秒数，次数或时间用尽时返回None"""
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.delay(attempt)
+        if self.deadline is not None and time.monotonic() + delay - started > self.deadline:
+            return None
+        return delay
+
+def _resolve(path: str) -> Type[BaseException]:
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+def retry(policy: Optional[RetryPolicy] = None, **overrides):
+    """
+    按策略重试的装饰器，同时支持普通函数和 async 函数。
+
+    用法: @retry(max_attempts=5, retry_on=(TimeoutError,)) 或 @retry(RetryPolicy(...))
+    """
+    policy = policy or RetryPolicy(**overrides)
+
+    def decorator(func):
+        def exhausted(attempt, e):
+            return RetryError(f"{func.__name__} failed after {attempt} attempts: {e}", e)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                import asyncio  # 只有async调用方才需要，此时asyncio早已导入
+                started, attempt = time.monotonic(), 0
+                while True:
+                    attempt += 1
+                    try:
+                        return await func(*args, **kwargs)
+                    except policy.exceptions() as e:
+                        print(f"Attempt {attempt} failed: {e}")
+                        delay = policy.next_delay(attempt, started)
+                        if delay is None:
+                            raise exhausted(attempt, e) from e
+                    await asyncio.sleep(delay)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started, attempt = time.monotonic(), 0
+            while True:
+                attempt += 1
+                try:
+                    return func(*args, **kwargs)
+                except policy.exceptions() as e:
+                    print(f"Attempt {attempt} failed: {e}")
+                    delay = policy.next_delay(attempt, started)
+                    if delay is None:
+                        raise exhausted(attempt, e) from e
+                time.sleep(delay)
+        return wrapper
+    return decorator
+
+# ========== 熔断 ==========
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间直接拒绝调用"""
+
+class CircuitBreaker:
+    """
+    连续失败 failure_threshold 次后打开，reset_timeout 秒内的调用直接跳过；
+    到时间后放行一次试探调用（半开），成功则关闭，失败则重新计时。
+    """
+    def __init__(self, name: str = "", failure_threshold: int = 3, reset_timeout: float = 300):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    def call(self, func: Callable, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str, failure_threshold: int = 3, reset_timeout: float = 300) -> CircuitBreaker:
+    """按名字共享的熔断器，比如每个定位器一个"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
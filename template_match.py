@@ -0,0 +1,184 @@
+from __future__ import annotations
+import time
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+pyautogui = lazy_import("pyautogui", "需要图形界面，无头环境请用页面截图匹配")
+
+# ========== 模板匹配 ==========
+class TemplateMatcher:
+    """
+    预加载一组模板图片（灰度，可选多个缩放比例），截一次屏就把所有模板匹配一遍。
+
+    参数:
+    - template_paths: 模板图片路径，匹配结果按这个顺序决定优先级。
+    - scales: 模板的缩放比例，页面缩放或高分屏下按钮大小不同时使用。
+    - confidence: 匹配得分阈值（TM_CCOEFF_NORMED），与 pyautogui 的 confidence 含义一致。
+    - coarse: 粗匹配的缩小比例，先在缩小的截图上找候选位置，再在原图的小窗口里精确匹配；为1时直接全图匹配。
+    """
+    COARSE_MARGIN = 0.2  # 粗匹配得分比阈值低这么多以内，才去原图上精确匹配
+    MIN_COARSE_SIZE = 12  # 模板缩小后小于这个尺寸就不做粗匹配
+
+    def __init__(self, template_paths: Sequence[str], scales: Sequence[float] = (1.0,), confidence: float = 0.8, coarse: float = 0.5):
+        self.confidence = confidence
+        self.coarse = coarse
+        self.templates = {}  # path -> [(scale, 灰度模板, 缩小的灰度模板或None)]
+        for path in template_paths:
+            img = cv2.imdecode(np.fromfile(path, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError(f"无法读取模板图片: {path}")
+            self.templates[path] = []
+            for scale in scales:
+                template = img if scale == 1.0 else cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                small = None
+                if coarse < 1 and min(template.shape) * coarse >= self.MIN_COARSE_SIZE:
+                    small = cv2.resize(template, None, fx=coarse, fy=coarse, interpolation=cv2.INTER_AREA)
+                self.templates[path].append((scale, template, small))
+
+    @staticmethod
+    def grab(region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """截取屏幕（或 region=(left, top, width, height) 区域）并转成灰度"""
+        shot = pyautogui.screenshot(region=region)
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_RGB2GRAY)
+
+    def match(self, screen: np.ndarray, names: Optional[Sequence[str]] = None) -> Optional[Tuple[str, Tuple[int, int], float]]:
+        """
+        在一张灰度图上匹配模板，返回第一个（按模板顺序）达到阈值的 (模板路径, 中心坐标, 得分)，都没匹配上返回None。
+        """
+        screen_small = None
+        for name in names or self.templates:
+            best = None
+            for scale, template, small in self.templates[name]:
+                th, tw = template.shape
+                if th > screen.shape[0] or tw > screen.shape[1]:
+                    continue
+                if small is not None:
+                    if screen_small is None:
+                        screen_small = cv2.resize(screen, None, fx=self.coarse, fy=self.coarse, interpolation=cv2.INTER_AREA)
+                    found = self._match_coarse_to_fine(screen, screen_small, template, small)
+                else:
+                    found = self._match_full(screen, template)
+                if found is None:
+                    continue
+                score, (x, y) = found
+                if score >= self.confidence and (best is None or score > best[2]):
+                    best = (name, (x + tw // 2, y + th // 2), score)
+            if best:
+                return best
+        return None
+
+    @staticmethod
+    def _match_full(screen, template):
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+        return score, loc
+
+    def _match_coarse_to_fine(self, screen, screen_small, template, small):
+        if small.shape[0] > screen_small.shape[0] or small.shape[1] > screen_small.shape[1]:
+            return self._match_full(screen, template)
+        score, (x, y) = self._match_full(screen_small, small)
+        if score < self.confidence - self.COARSE_MARGIN:
+            return None
+        # 在原图上候选位置附近的小窗口里精确匹配
+        pad = int(2 / self.coarse) + 2
+        th, tw = template.shape
+        x0, y0 = max(0, int(x / self.coarse) - pad), max(0, int(y / self.coarse) - pad)
+        x0, y0 = min(x0, screen.shape[1] - tw), min(y0, screen.shape[0] - th)
+        window = screen[y0:y0 + th + 2 * pad, x0:x0 + tw + 2 * pad]
+        score, (dx, dy) = self._match_full(window, template)
+        return score, (x0 + dx, y0 + dy)
+
+    @staticmethod
+    def decode(image: bytes) -> np.ndarray:
+        """把内存中的PNG/JPEG（比如 page.screenshot() 的返回值）直接解码成灰度图，不落盘"""
+        screen = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if screen is None:
+            raise ValueError("无法解码截图")
+        return screen
+
+    def locate_in_image(self, image: bytes, names: Optional[Sequence[str]] = None, origin: Tuple[float, float] = (0, 0), pixel_ratio: float = 1.0) -> Optional[Tuple[str, Tuple[float, float], float]]:
+        """
+        在截图bytes上匹配所有模板，把中心坐标换算成截图所在的坐标系：origin + 像素坐标 / pixel_ratio。
+        比如元素截图时 origin 是元素左上角的页面坐标，按设备像素截图时 pixel_ratio 是 devicePixelRatio。
+        """
+        found = self.match(self.decode(image), names)
+        if found:
+            name, (x, y), score = found
+            found = (name, (origin[0] + x / pixel_ratio, origin[1] + y / pixel_ratio), score)
+        return found
+
+    def locate(self, region: Optional[Tuple[int, int, int, int]] = None, names: Optional[Sequence[str]] = None) -> Optional[Tuple[str, Tuple[int, int], float]]:
+        """截一次屏匹配所有模板，返回的坐标是屏幕坐标"""
+        found = self.match(self.grab(region), names)
+        if found and region:
+            name, (x, y), score = found
+            found = (name, (x + region[0], y + region[1]), score)
+        return found
+
+@lru_cache(maxsize=None)
+def get_matcher(template_paths: Tuple[str, ...], scales: Tuple[float, ...] = (1.0,), confidence: float = 0.8, coarse: float = 0.5) -> TemplateMatcher:
+    """按参数缓存的匹配器，同一组模板只加载一次"""
+    return TemplateMatcher(template_paths, scales, confidence, coarse)
+
+# ========== 变化检测轮询 ==========
+class ScreenWatcher:
+    """
+    按固定帧率截屏等待模板出现，只在画面有变化的帧、变化的区域里做模板匹配。
+
+    参数:
+    - matcher: 用来匹配的 TemplateMatcher。
+    - fps: 每秒截屏次数。
+    - region: 只监视屏幕上的这个区域 (left, top, width, height)。
+    - diff_scale: 做帧差时把截图缩小的比例，越小越省CPU。
+    - diff_threshold: 缩小后像素灰度差超过该值才算变化。
+    """
+    def __init__(self, matcher: TemplateMatcher, fps: float = 10, region: Optional[Tuple[int, int, int, int]] = None, diff_scale: float = 0.125, diff_threshold: int = 8):
+        self.matcher = matcher
+        self.fps = fps
+        self.region = region
+        self.diff_scale = diff_scale
+        self.diff_threshold = diff_threshold
+        # 模板最大尺寸，变化区域要向外扩这么多，保证跨在边界上的模板也能匹配到
+        self.pad = max(max(t.shape) for variants in matcher.templates.values() for _, t, _ in variants)
+        self.stats = {'frames': 0, 'searched': 0, 'skipped': 0}
+
+    def _dirty_box(self, small: np.ndarray, prev_small: np.ndarray, shape) -> Optional[Tuple[int, int, int, int]]:
+        """变化区域在原图上的 (x0, y0, x1, y1)，没有变化返回None"""
+        ys, xs = np.nonzero(cv2.absdiff(small, prev_small) > self.diff_threshold)
+        if not len(xs):
+            return None
+        scale = 1 / self.diff_scale
+        x0, y0 = int(xs.min() * scale) - self.pad, int(ys.min() * scale) - self.pad
+        x1, y1 = int((xs.max() + 1) * scale) + self.pad, int((ys.max() + 1) * scale) + self.pad
+        return max(0, x0), max(0, y0), min(shape[1], x1), min(shape[0], y1)
+
+    def wait(self, timeout: float, names: Optional[Sequence[str]] = None) -> Optional[Tuple[str, Tuple[int, int], float]]:
+        """等待模板出现，返回 (模板路径, 屏幕坐标, 得分)，超时返回None"""
+        deadline = time.monotonic() + timeout
+        prev_small = None
+        while True:
+            frame_start = time.monotonic()
+            screen = self.matcher.grab(self.region)
+            small = cv2.resize(screen, None, fx=self.diff_scale, fy=self.diff_scale, interpolation=cv2.INTER_AREA)
+            self.stats['frames'] += 1
+
+            # 第一帧全图匹配，之后只匹配变化区域
+            box = (0, 0, screen.shape[1], screen.shape[0]) if prev_small is None else self._dirty_box(small, prev_small, screen.shape)
+            prev_small = small
+            if box is None:
+                self.stats['skipped'] += 1
+            else:
+                self.stats['searched'] += 1
+                x0, y0, x1, y1 = box
+                found = self.matcher.match(screen[y0:y1, x0:x1], names)
+                if found:
+                    name, (x, y), score = found
+                    left, top = self.region[:2] if self.region else (0, 0)
+                    return name, (x + x0 + left, y + y0 + top), score
+
+            if frame_start >= deadline:
+                return None
+            time.sleep(max(0, min(1 / self.fps - (time.monotonic() - frame_start), deadline - time.monotonic())))
@@ -0,0 +1,16 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope="session")
+def main_sens():
+    """main-sens.py 文件名带横线，按路径加载"""
+    spec = importlib.util.spec_from_file_location("main_sens", os.path.join(ROOT, "main-sens.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
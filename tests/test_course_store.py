@@ -0,0 +1,27 @@
+from course_store import CourseStore
+
+def test_pending_excludes_done_and_skipped(tmp_path):
+    store = CourseStore(str(tmp_path / "state.jsonl"))
+    store.mark_seen("A", 1, True)
+    store.mark_seen("B", 1, False)
+    store.mark_seen("C", 2, False)
+    assert sorted(store.pending()) == ["B", "C"]
+    assert store.pending(skip=["C"]) == ["B"]
+    store.mark_done("B")
+    assert store.pending(skip=["C"]) == []
+
+def test_page_completed_status_survives_stale_record(main_sens, tmp_path):
+    store = CourseStore(str(tmp_path / "state.jsonl"))
+    store.mark_seen("A", 1, True)
+    store.courses["A"]['updated_at'] -= 3 * 3600  # 记录已经过期
+    store.mark_seen("A", 1, True)
+    assert not store.is_done("A", 1)
+
+    class Feed:
+        page_titles = {1: ["A"]}
+        courses = {"A": {'completed': True}}
+        def drain(self):
+            pass
+
+    config = {**main_sens.CONFIG, 'recheck_done_hours': 1, 'skip_courses': []}
+    assert main_sens.list_courses_from_feed(Feed(), config, 1, store) == []
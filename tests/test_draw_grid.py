@@ -0,0 +1,30 @@
+import numpy as np
+
+import draw_grid
+
+def _job(n=10):
+    times = list(range(n))
+    return {'output': 'out.png', 'layout': 'grid', 'style': {'savefig.dpi': 42},
+            'scenarios': [{'times': times, 'accuracies': [[0.5] * n], 'colors': ['b'], 'markers': ['o'],
+                           'labels': ['a'], 'scenario': 'S'}]}
+
+def test_render_job_applies_style_once(tmp_path, monkeypatch):
+    calls = []
+    rc_context = draw_grid.plt.rc_context
+    monkeypatch.setattr(draw_grid.plt, 'rc_context', lambda rc=None: calls.append(rc) or rc_context(rc))
+    path = draw_grid.render_job(_job(), str(tmp_path))
+    assert calls == [{'savefig.dpi': 42}]
+    # savefig.* 参数在保存时仍然生效
+    from PIL import Image
+    assert round(Image.open(path).info['dpi'][0]) == 42
+
+def test_minmax_never_exceeds_max_points():
+    rng = np.random.default_rng(0)
+    for n, max_points in [(10000, 2000), (10001, 2000), (5000, 2001), (100, 3), (100, 4), (7, 5)]:
+        y = rng.normal(size=n)
+        x, yd = draw_grid.downsample_series(np.arange(n, dtype=float), y, max_points, 'minmax')
+        assert len(x) <= max_points
+        assert x[0] == 0 and x[-1] == n - 1
+    y = rng.normal(size=10000)
+    x, yd = draw_grid.downsample_series(np.arange(10000, dtype=float), y, 2000, 'minmax')
+    assert yd.min() == y.min() and yd.max() == y.max()
@@ -0,0 +1,84 @@
+import base64
+import http.cookiejar
+import json
+import os
+import sys
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fixture_site import play_button_pixels, site_config, start_server
+from template_match import get_matcher
+
+PLAY_BTN_PATHS = tuple(os.path.join(ROOT, name) for name in ('play.png', 'play1.png', 'play2.png'))
+
+@pytest.fixture
+def site():
+    server, site, base_url = start_server(pages=2, cards_per_page=3, completed_ratio=0, video_seconds=1,
+                                          api_delay_ms=0, status_delay_ms=0)
+    yield site, base_url
+    server.shutdown()
+
+def _opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+def test_http_flow(site):
+    site, base_url = site
+    opener = _opener()
+    assert opener.open(f"{base_url}/courses?page=1").geturl().endswith("/login")  # 未登录跳转到登录页
+    opener.open(f"{base_url}/api/login", data=b"username=u1&password=p").read()
+    items = json.load(opener.open(f"{base_url}/course/list?page=1"))['data']['list']
+    assert [item['studyStatus'] for item in items] == ["未完成"] * 3
+
+    player = opener.open(f"{base_url}/player?id={items[0]['id']}").read().decode("utf-8")
+    assert 'class="vjs-big-play-button"><canvas width="35" height="37">' in player
+    assert "__PLAY_PIXELS__" not in player
+
+    opener.open(f"{base_url}/study/progress", data=json.dumps({'courseId': items[0]['id']}).encode()).read()
+    statuses = json.load(opener.open(f"{base_url}/course/status?page=1"))
+    assert statuses[items[0]['id']] and site.stats['completions'] == 1
+
+def test_play_button_matches_template():
+    """按播放器的布局把 canvas 的像素贴到截图里，模板匹配应该在按钮上命中 play.png"""
+    width, height, pixels = play_button_pixels()
+    button = np.frombuffer(base64.b64decode(pixels), np.uint8).reshape(height, width, 4)
+    frame = np.zeros((340, 600, 3), np.uint8)
+    frame[140:200, 260:340] = (0x3f, 0x33, 0x2b)  # #2b333f，BGR
+    left, top = 260 + (80 - width) // 2, 140 + (60 - height) // 2
+    frame[top:top + height, left:left + width] = cv2.cvtColor(button, cv2.COLOR_RGBA2BGR)
+    shot = cv2.imencode(".png", frame)[1].tobytes()
+
+    found = get_matcher(PLAY_BTN_PATHS, scales=(1.0, 0.75, 1.25), confidence=0.8).locate_in_image(shot)
+    assert found and found[0] == PLAY_BTN_PATHS[0]
+    x, y = found[1]
+    assert 260 <= x < 340 and 140 <= y < 200
+
+def _launch_firefox(p, prefs):
+    try:
+        return p.firefox.launch(headless=True, firefox_user_prefs=prefs)
+    except Exception as e:
+        pytest.skip(f"Playwright 的 firefox 不可用: {str(e).splitlines()[0]}")
+
+def test_end_to_end_in_browser(site, main_sens, monkeypatch, capsys):
+    """登录 → 课程页 → 列表 → 播放一个视频，播放按钮要靠图像定位点中，站点收到完成上报"""
+    site, base_url = site
+    monkeypatch.chdir(ROOT)  # 模板图片按相对路径读取
+    config = {**main_sens.CONFIG, **site_config(base_url)}
+    with main_sens.playwright_api.sync_playwright() as p:
+        browser = _launch_firefox(p, main_sens.lean_firefox_prefs(config))
+        try:
+            page = browser.new_context().new_page()
+            main_sens.login(page, config, "e2e", "password")
+            main_sens.navigate_to_courses(page, config)
+            unfinished = main_sens.list_courses(main_sens.Pager(page, config), config, 1)
+            assert unfinished
+            assert main_sens.play_video(page, unfinished[0], config, True)
+        finally:
+            browser.close()
+    assert "---图像定位播放" in capsys.readouterr().out
+    assert site.stats['completions'] == 1
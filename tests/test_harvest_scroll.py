@@ -0,0 +1,67 @@
+import auto_tools
+
+def fake_page(monkeypatch, pages, grow_rounds):
+    """pages: 每次提取时新出现的条目；grow_rounds: 前几次滚动页面会变高，之后只有DOM变化（比如时钟）"""
+    batches = iter(pages)
+    scrolls = []
+
+    def extract(driver, selector, schema="text", by=None, mark=None):
+        return next(batches, [])
+
+    def scroll(driver, timeout, quiet):
+        scrolls.append(1)
+        return {'changed': True, 'grew': len(scrolls) <= grow_rounds}
+
+    monkeypatch.setattr(auto_tools, "extract_elements", extract)
+    monkeypatch.setattr(auto_tools, "_scroll_and_wait", scroll)
+    return scrolls
+
+def test_stops_despite_constant_dom_changes(monkeypatch):
+    scrolls = fake_page(monkeypatch, [["a", "b"], ["c"], []], grow_rounds=2)
+    items = [item for batch in auto_tools.harvest_scroll(None, ".item", idle_rounds=2, max_rounds=500) for item in batch]
+    assert items == ["a", "b", "c"]
+    assert len(scrolls) < 10
+
+def test_duplicates_are_not_progress(monkeypatch):
+    scrolls = fake_page(monkeypatch, [["a"]] * 100, grow_rounds=0)
+    batches = list(auto_tools.harvest_scroll(None, ".item", idle_rounds=2))
+    assert batches == [["a"]]
+    assert len(scrolls) == 2
+
+class FakeTimeouts:
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def script(self):
+        return self.driver.script_timeout
+
+class FakeDriver:
+    """记录异步脚本超时的设置，执行脚本时按给定结果返回或抛异常"""
+    def __init__(self, result):
+        self.script_timeout = 30
+        self.result = result
+        self.seen_timeouts = []
+        self.timeouts = FakeTimeouts(self)
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script, *args):
+        self.seen_timeouts.append(self.script_timeout)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+def test_scroll_restores_script_timeout():
+    driver = FakeDriver({'changed': False, 'grew': False})
+    assert auto_tools._scroll_and_wait(driver, 3, 0.3) == {'changed': False, 'grew': False}
+    assert driver.seen_timeouts == [8] and driver.script_timeout == 30
+
+def test_wait_video_restores_script_timeout_on_error():
+    driver = FakeDriver(RuntimeError("script timeout"))
+    try:
+        auto_tools._wait_video(driver, "ended", "video", 0, timeout=5, stall_timeout=60)
+    except RuntimeError:
+        pass
+    assert driver.seen_timeouts and driver.script_timeout == 30
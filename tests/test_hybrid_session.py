@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import auto_tools
+
+def make_session(monkeypatch, login_url):
+    monkeypatch.setattr(auto_tools, "session_from_driver", lambda *args, **kwargs: None)
+    return auto_tools.HybridSession(None, lambda driver: True, login_url=login_url)
+
+def response(url, status=200):
+    return SimpleNamespace(url=url, status_code=status)
+
+def test_login_in_other_paths_is_not_expired(monkeypatch):
+    session = make_session(monkeypatch, "https://example.com/auth/login")
+    assert not session.is_expired(response("https://example.com/api/login-history?page=2"))
+    assert not session.is_expired(response("https://example.com/api/data?next=/auth/login"))
+
+def test_redirect_to_login_page_is_expired(monkeypatch):
+    session = make_session(monkeypatch, "https://example.com/auth/login")
+    assert session.is_expired(response("https://example.com/auth/login?redirect=/api/data"))
+    assert session.is_expired(response("https://example.com/api/data", 401))
+
+def test_without_login_url_only_status_codes(monkeypatch):
+    session = make_session(monkeypatch, None)
+    assert not session.is_expired(response("https://example.com/login"))
+    assert session.is_expired(response("https://example.com/x", 403))
@@ -0,0 +1,23 @@
+import numpy as np
+
+import auto_tools
+
+def _onehot(indices, n, p=0.9):
+    probs = np.full((len(indices), n), (1 - p) / (n - 1))
+    probs[np.arange(len(indices)), indices] = p
+    return probs.tolist()
+
+def test_ctc_merges_repeats_then_drops_blanks():
+    charsets = ["", "A", "B"]
+    # blank A A blank B B blank
+    result = {'charsets': charsets, 'probability': _onehot([0, 1, 1, 0, 2, 2, 0], 3)}
+    text, confidence = auto_tools._parse_ocr_result(result)
+    assert text == "AB"
+    assert abs(confidence - 0.9) < 1e-9
+
+def test_ctc_keeps_repeats_separated_by_blank():
+    result = {'charsets': ["", "A"], 'probability': _onehot([1, 0, 1], 2)}
+    assert auto_tools._parse_ocr_result(result)[0] == "AA"
+
+def test_new_ddddocr_result():
+    assert auto_tools._parse_ocr_result({'text': "XY", 'confidence': "0.5"}) == ("XY", 0.5)
@@ -0,0 +1,39 @@
+class FakeListPage:
+    """翻页按钮都点不动，只能整页刷新的列表页"""
+    def __init__(self, url):
+        self.url = url
+        self.calls = []
+
+    def query_selector(self, selector):
+        return None
+
+    def click(self, selector, timeout=None):
+        self.calls.append(("click", selector))
+        raise TimeoutError(selector)
+
+    def reload(self):
+        self.calls.append(("reload",))
+
+    def wait_for_selector(self, selector):
+        pass
+
+    def wait_for_function(self, script, arg=None, timeout=None):
+        self.calls.append(("wait_ready", arg))
+
+def make_pager(main_sens, url, current):
+    config = {**main_sens.CONFIG, 'page_number_selector': None, 'page_url_template': None}
+    return main_sens.Pager(FakeListPage(url), config, current=current)
+
+def test_reload_keeps_page_from_url(main_sens):
+    pager = make_pager(main_sens, "http://x/courses?page=3", 3)
+    pager.refresh()
+    assert pager.current == 3
+    clicks = [c for c in pager.page.calls if c[0] == "click"]
+    assert clicks == [("click", "text=上一页")]  # 只有刷新前去相邻页的那次，刷新后没有再往后翻
+    assert pager.page.calls[-1][0] == "wait_ready"
+
+def test_reload_on_first_page_waits_ready(main_sens):
+    pager = make_pager(main_sens, "http://x/courses", 1)
+    pager.refresh()
+    assert pager.current == 1
+    assert pager.page.calls[-1][0] == "wait_ready"
@@ -0,0 +1,31 @@
+import json
+from concurrent.futures import Future
+
+import multi_account
+
+class FailingExecutor:
+    """同步执行的进程池替身，账号每次都失败"""
+    submitted = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def submit(self, fn, account, state_dir):
+        FailingExecutor.submitted.append(account['username'])
+        future = Future()
+        future.set_exception(RuntimeError("boom"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+def test_retries_are_counted_per_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_account, "ProcessPoolExecutor", FailingExecutor)
+    monkeypatch.setattr(multi_account.signal, "signal", lambda *args: None)
+    # 上次运行已经失败过3次
+    (tmp_path / "scheduler.json").write_text(json.dumps({'u1': {'done': False, 'attempts': 3}}), encoding="utf-8")
+    FailingExecutor.submitted = []
+    result = multi_account.Scheduler([{'username': "u1", 'password': "p"}], str(tmp_path), retries=1).run()
+    assert result == {'u1': False}
+    assert FailingExecutor.submitted == ["u1", "u1"]  # 第一次加一次重试
+    assert json.loads((tmp_path / "scheduler.json").read_text(encoding="utf-8"))['u1']['attempts'] == 5
@@ -0,0 +1,71 @@
+import time
+
+class FakeVideo:
+    def __init__(self, target):
+        self.target = target
+
+    @property
+    def first(self):
+        return self
+
+    def evaluate(self, script, *args, **kwargs):
+        if self.target.state is None:
+            raise TimeoutError("video")
+        return dict(self.target.state)
+
+class FakeVideoTarget:
+    """probe_video 用到的 locator('video').first.evaluate(...)；state 为None时相当于没有视频元素"""
+    def __init__(self, state=None):
+        self.state = state
+
+    def locator(self, selector):
+        return FakeVideo(self)
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+        self.shots = 0
+
+    def screenshot(self):
+        self.shots += 1
+        return b""
+
+    def close(self):
+        self.closed = True
+
+def make_session(main_sens, target, state, **fields):
+    now = time.monotonic()
+    return {'title': "课程A\n学分", 'page': FakePage(), 'target': target, 'config': {'poll_seconds': 1},
+            'first_shot': b"", 'start_time': 0, 'has_video': target.state is not None, 'state': state,
+            'verify_until': now + 15, 'due': now, 'track': "课程A", 'opened_at': now, 'detect_start': now,
+            **fields}
+
+def test_deadline_without_ended_is_not_done(main_sens):
+    target = FakeVideoTarget({'currentTime': 10, 'duration': 100, 'paused': True, 'ended': False})
+    session = make_session(main_sens, target, 'playing', deadline=time.monotonic() - 1)
+    assert main_sens.step_video(session)
+    assert session['page'].closed
+    assert not session.get('played') and session['result'] == "timeout"
+
+def test_ended_is_done(main_sens):
+    target = FakeVideoTarget({'currentTime': 100, 'duration': 100, 'paused': True, 'ended': True})
+    session = make_session(main_sens, target, 'playing', deadline=time.monotonic() + 60)
+    assert main_sens.step_video(session)
+    assert session['played'] and session['result'] == "played" and session['duration'] == 100
+
+def test_no_video_element_waits_for_verify_seconds(main_sens):
+    target = FakeVideoTarget()
+    session = make_session(main_sens, target, 'verifying')
+    assert not main_sens.step_video(session)
+    # 没有视频元素时不能1秒后就拿截图比对
+    assert session['page'].shots == 0 and not session['page'].closed
+    assert session['due'] <= session['verify_until']
+
+def test_late_video_element_is_used(main_sens):
+    target = FakeVideoTarget()
+    session = make_session(main_sens, target, 'verifying')
+    assert not main_sens.step_video(session)
+    target.state = {'currentTime': 2, 'duration': 100, 'paused': False, 'ended': False}
+    session['due'] = time.monotonic()
+    assert not main_sens.step_video(session)
+    assert session['state'] == 'playing' and session['has_video'] and session['page'].shots == 0
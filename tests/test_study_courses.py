@@ -0,0 +1,26 @@
+from course_store import CourseStore
+
+class LastPagePager:
+    """只有一页的列表：翻不到下一页"""
+    def __init__(self, page, config, current=1, feed=None):
+        self.current = current
+
+    def goto(self, to_page_num):
+        return to_page_num == 1
+
+def run_single_page(main_sens, monkeypatch, store):
+    monkeypatch.setattr(main_sens, "Pager", LastPagePager)
+    monkeypatch.setattr(main_sens, "list_courses", lambda pager, config, page_num, store=None, refresh=False: [])
+    return main_sens.study_courses(None, {**main_sens.CONFIG, 'skip_courses': ["Skipped\n学分"]}, True, store)
+
+def test_not_done_while_courses_pending(main_sens, monkeypatch, tmp_path):
+    store = CourseStore(str(tmp_path / "state.jsonl"))
+    store.mark_seen("A", 1, True)
+    store.mark_seen("B", 1, False)  # 播放失败，还没完成
+    assert run_single_page(main_sens, monkeypatch, store) is False
+
+def test_done_when_only_skipped_left(main_sens, monkeypatch, tmp_path):
+    store = CourseStore(str(tmp_path / "state.jsonl"))
+    store.mark_seen("A", 1, True)
+    store.mark_seen("Skipped\n学分", 1, False)
+    assert run_single_page(main_sens, monkeypatch, store) is True
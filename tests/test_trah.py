@@ -0,0 +1,26 @@
+import io
+
+import cv2
+import imagehash
+import numpy as np
+from PIL import Image
+
+import trah
+
+def _png(img):
+    return cv2.imencode(".png", img)[1].tobytes()
+
+def test_phash_matches_imagehash():
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        base = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (31, 31), 0)
+        other = np.clip(base.astype(int) + rng.integers(-40, 40, base.shape), 0, 255).astype(np.uint8)
+        a, b = _png(base), _png(other)
+        expected = 1 - (imagehash.phash(Image.open(io.BytesIO(a))) - imagehash.phash(Image.open(io.BytesIO(b)))) / 64
+        assert trah.compare_images(a, b)['phash'] == expected
+
+def test_compare_batch_does_not_print(capsys):
+    frame = _png(np.zeros((40, 40, 3), np.uint8))
+    results = trah.compare_batch(frame, [frame, frame])
+    assert [r['mse'] for r in results] == [0.0, 0.0]
+    assert capsys.readouterr().out == ""
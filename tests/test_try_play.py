@@ -0,0 +1,41 @@
+class FakeLocator:
+    def __init__(self, target, selector):
+        self.target = target
+        self.selector = selector
+
+    def click(self):
+        self.target.clicked.append(self.selector)
+        if self.selector not in self.target.clickable:
+            raise TimeoutError(self.selector)
+
+class FakeTarget:
+    """只实现 try_play 用到的 locator(...).click()"""
+    def __init__(self, clickable=()):
+        self.clickable = set(clickable)
+        self.clicked = []
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+def test_element_fallback_clicks_on_target(main_sens):
+    target = FakeTarget(clickable=[".vjs-big-play-button"])
+    assert main_sens.try_play(target, None, [], [".missing", ".vjs-big-play-button"], image_locator=None)
+    assert target.clicked == [".missing", ".vjs-big-play-button"]
+
+def test_element_fallback_after_image_miss(main_sens, tmp_path):
+    target = FakeTarget(clickable=["#play"])
+    # 模板图片不存在，图像定位失败后应退回到元素定位
+    assert main_sens.try_play(target, None, [str(tmp_path / "none.png")], ["#play"], image_locator="page")
+    assert target.clicked == ["#play"]
+
+def test_nothing_clickable(main_sens):
+    target = FakeTarget()
+    assert not main_sens.try_play(target, None, [], [".a", ".b"], image_locator=None)
+
+def test_lean_profile_keeps_images_for_image_locator(main_sens):
+    config = {**main_sens.CONFIG, 'image_locator': "page"}
+    assert 'permissions.default.image' not in main_sens.lean_firefox_prefs(config)
+    assert 'image' not in main_sens.lean_blocked_types(config)
+    config = {**main_sens.CONFIG, 'image_locator': None}
+    assert main_sens.lean_firefox_prefs(config)['permissions.default.image'] == 2
+    assert 'image' in main_sens.lean_blocked_types(config)
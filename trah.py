@@ -1,66 +1,155 @@
-from PIL import Image
-import imagehash
-import cv2
-from skimage.metrics import structural_similarity as ssim
-import numpy as np
-import time
-
-# ========== 装饰器 ==========
-def execution_time_decorator(func):
-    """用于装饰器，计算函数执行时间"""
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        print(f"Execution time: {time.time() - start_time:.2f}s")
-        return result
-    return wrapper
-
-def compare_images(image_path1, image_path2):
-    print(f"对比图片: {image_path1} 和 {image_path2}")
-    
-    # 方法 1: 感知哈希 (pHash)
-    @execution_time_decorator
-    def compare_phash(image1, image2):
-        hash1 = imagehash.phash(image1)
-        hash2 = imagehash.phash(image2)
-        similarity = 1 - (hash1 - hash2) / len(hash1.hash.flatten())
-        return similarity
-
-    # 方法 2: 结构相似性 (SSIM)
-    @execution_time_decorator
-    def compare_ssim(image1, image2):
-        if image1.shape != image2.shape:
-            image2 = cv2.resize(image2, (image1.shape[1], image1.shape[0]))
-        score, _ = ssim(image1, image2, full=True)
-        return score
-
-    # 方法 3: 像素均方误差 (MSE)
-    @execution_time_decorator
-    def compare_mse(image1, image2):
-        if image1.shape != image2.shape:
-            image2 = cv2.resize(image2, (image1.shape[1], image1.shape[0]))
-        mse = np.mean((image1 - image2) ** 2)
-        return mse
-
-    # 加载图片
-    pil_image1 = Image.open(image_path1)
-    pil_image2 = Image.open(image_path2)
-    
-    cv_image1 = cv2.imread(image_path1, cv2.IMREAD_GRAYSCALE)
-    cv_image2 = cv2.imread(image_path2, cv2.IMREAD_GRAYSCALE)
-
-    # 计算并打印结果
-    print("\n方法 1: 感知哈希 (pHash)")
-    phash_similarity = compare_phash(pil_image1, pil_image2)
-    print(f"相似度: {phash_similarity:.4f} (1.0 = 完全一致)")
-
-    print("\n方法 2: 结构相似性 (SSIM)")
-    ssim_similarity = compare_ssim(cv_image1, cv_image2)
-    print(f"相似度: {ssim_similarity:.4f} (1.0 = 完全一致)")
-
-    print("\n方法 3: 像素均方误差 (MSE)")
-    mse_error = compare_mse(cv_image1, cv_image2)
-    print(f"误差值: {mse_error:.2f} (0 = 完全一致)")
-
-
-compare_images(r"after_play_5s.png", r"after_play.png")
\ No newline at end of file
+import argparse
+import json
+import os
+import cv2
+import numpy as np
+from PIL import Image
+from instrumentation import timed
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+# ========== 图片加载 ==========
+def _luma(bgr: np.ndarray) -> np.ndarray:
+    """BGR转灰度，用和 PIL convert("L") 相同的整数公式，保证pHash与 imagehash 一致"""
+    b, g, r = (bgr[..., i].astype(np.uint32) for i in range(3))
+    return ((r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+def decode_gray(image) -> np.ndarray:
+    """把图片路径或图片bytes解码成灰度uint8数组，每张图只解码一次"""
+    if isinstance(image, (bytes, bytearray)):
+        data = np.frombuffer(image, np.uint8)
+    else:
+        data = np.fromfile(image, np.uint8)  # 兼容中文路径
+    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"无法解码图片: {image if isinstance(image, str) else '<bytes>'}")
+    return _luma(img)
+
+def load_gray_stack(images, size=None) -> np.ndarray:
+    """
+    把多张图片解码进一个共享的 (N, H, W) uint8 缓冲区。
+
+    参数:
+    - images: 图片路径或bytes的列表。
+    - size: 目标 (H, W)，默认取第一张图的尺寸，尺寸不同的图会缩放到这个尺寸。
+    """
+    stack = None
+    for i, image in enumerate(images):
+        img = decode_gray(image)
+        if stack is None:
+            size = size or img.shape
+            stack = np.empty((len(images), *size), np.uint8)
+        if img.shape != tuple(size):
+            img = cv2.resize(img, (size[1], size[0]), interpolation=cv2.INTER_AREA)
+        stack[i] = img
+    return stack if stack is not None else np.empty((0, *(size or (0, 0))), np.uint8)
+
+# ========== 相似度指标（批量） ==========
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * k * (2 * np.arange(n)[None, :] + 1) / (2 * n))
+
+_DCT32 = _dct_matrix(32)
+
+def phash_bits(stack: np.ndarray, hash_size: int = 8, highfreq_factor: int = 4) -> np.ndarray:
+    """
+    批量计算感知哈希，返回 (N, hash_size*hash_size) 的bool数组。
+    缩放和 imagehash.phash 一样用PIL的LANCZOS（cv2的插值结果不同，会改变哈希位），
+    对 decode_gray 解码的PNG截图，结果与 imagehash.phash 相同；JPEG因解码器不同可能有细微差别。
+    """
+    img_size = hash_size * highfreq_factor
+    dct = _DCT32 if img_size == 32 else _dct_matrix(img_size)
+    small = np.stack([np.asarray(Image.fromarray(f).resize((img_size, img_size), Image.Resampling.LANCZOS)) for f in stack]).astype(np.float64)
+    coeffs = dct @ small @ dct.T  # 一次完成所有帧的二维DCT
+    low = coeffs[:, :hash_size, :hash_size].reshape(len(stack), -1)
+    return low > np.median(low, axis=1, keepdims=True)
+
+def phash_similarity(reference: np.ndarray, stack: np.ndarray) -> np.ndarray:
+    """参考图和每一帧的pHash相似度，1.0 = 完全一致"""
+    bits = phash_bits(np.concatenate([reference[None], stack]))
+    return 1 - np.count_nonzero(bits[1:] != bits[0], axis=1) / bits.shape[1]
+
+def _box_mean(x: np.ndarray, win: int) -> np.ndarray:
+    """对 (N, H, W) 做win×win的均值滤波，只保留完整窗口的部分（即 skimage 裁掉边缘后的区域）"""
+    c = np.pad(x, ((0, 0), (1, 0), (1, 0))).cumsum(axis=1).cumsum(axis=2)
+    s = c[:, win:, win:] - c[:, :-win, win:] - c[:, win:, :-win] + c[:, :-win, :-win]
+    return s / (win * win)
+
+def ssim_batch(reference: np.ndarray, stack: np.ndarray, win: int = 7, chunk: int = 32) -> np.ndarray:
+    """参考图和每一帧的SSIM，参数与 skimage.metrics.structural_similarity 的默认值一致"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    cov_norm = win * win / (win * win - 1)
+    ref = reference.astype(np.float64)[None]
+    ux, uxx = _box_mean(ref, win), _box_mean(ref * ref, win)
+    vx = cov_norm * (uxx - ux * ux)
+    scores = np.empty(len(stack))
+    for start in range(0, len(stack), chunk):  # 分块处理，限制float64临时数组的内存
+        y = stack[start:start + chunk].astype(np.float64)
+        uy, uyy, uxy = _box_mean(y, win), _box_mean(y * y, win), _box_mean(ref * y, win)
+        vy = cov_norm * (uyy - uy * uy)
+        vxy = cov_norm * (uxy - ux * uy)
+        s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+        scores[start:start + chunk] = s.mean(axis=(1, 2))
+    return scores
+
+def mse_batch(reference: np.ndarray, stack: np.ndarray, chunk: int = 64) -> np.ndarray:
+    """参考图和每一帧的像素均方误差，先转成有符号类型再相减，避免uint8溢出"""
+    ref = reference.astype(np.float32)
+    errors = np.empty(len(stack))
+    for start in range(0, len(stack), chunk):
+        diff = stack[start:start + chunk].astype(np.float32) - ref
+        errors[start:start + chunk] = np.mean(diff * diff, axis=(1, 2), dtype=np.float64)
+    return errors
+
+@timed()
+def compare_batch(reference, frames, names=None) -> list:
+    """
+    一次对比一张参考图和一组帧，同时计算 pHash、SSIM 和 MSE。
+
+    参数:
+    - reference: 参考图路径或bytes。
+    - frames: 帧的路径或bytes列表，会缩放到参考图尺寸。
+    - names: 结果中每一帧的名字，默认用frames本身（是路径时）或序号。
+
+    返回: 每帧一个字典 {'frame', 'phash', 'ssim', 'mse'}。
+    """
+    ref = decode_gray(reference)
+    stack = load_gray_stack(frames, ref.shape)
+    phash, ssim, mse = phash_similarity(ref, stack), ssim_batch(ref, stack), mse_batch(ref, stack)
+    names = names or [f if isinstance(f, str) else i for i, f in enumerate(frames)]
+    return [
+        {'frame': name, 'phash': float(p), 'ssim': float(s), 'mse': float(m)}
+        for name, p, s, m in zip(names, phash, ssim, mse)
+    ]
+
+def compare_images(image_path1, image_path2) -> dict:
+    """对比两张图片，返回 {'phash': 相似度, 'ssim': 相似度, 'mse': 误差值}，1.0/1.0/0 = 完全一致"""
+    result = compare_batch(image_path1, [image_path2])[0]
+    del result['frame']
+    return result
+
+# ========== 命令行 ==========
+def main():
+    parser = argparse.ArgumentParser(description="批量对比参考图和目录中的帧，判断视频是否在播放")
+    parser.add_argument("reference", help="参考图（比如开始播放时的截图）")
+    parser.add_argument("frames_dir", help="帧图片所在目录")
+    parser.add_argument("--threshold", type=float, default=0.95, help="pHash相似度不低于该值时判定为卡住")
+    parser.add_argument("--json", dest="json_path", help="结果写入JSON文件，不指定时打印到屏幕")
+    args = parser.parse_args()
+
+    frames = sorted(os.path.join(args.frames_dir, f) for f in os.listdir(args.frames_dir) if f.lower().endswith(IMAGE_EXTS))
+    results = compare_batch(args.reference, frames)
+    for result in results:
+        result['state'] = 'stalled' if result['phash'] >= args.threshold else 'playing'
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        for r in results:
+            print(f"{r['frame']}: pHash {r['phash']:.4f}  SSIM {r['ssim']:.4f}  MSE {r['mse']:.2f}  {r['state']}")
+    stalled = sum(r['state'] == 'stalled' for r in results)
+    print(f"共{len(results)}帧，播放中{len(results) - stalled}帧，卡住{stalled}帧")
+
+if __name__ == "__main__":
+    main()